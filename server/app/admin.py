@@ -1,5 +1,4 @@
 """import module that register models"""
-from datetime import timedelta
 from typing import Iterable
 
 from django.contrib import admin
@@ -13,6 +12,7 @@ from app.models import (
     Training,
     Exercise,
     Approach,
+    Purchase,
 )
 from app.forms import TelegramUserChangeForm
 
@@ -78,35 +78,8 @@ class TrainingProgramAdmin(admin.ModelAdmin):
 
     list_display = ("name", "training_count", "difficulty", "avg_training_time")
 
-    def training_count(self, instance: TrainingProgram) -> int:
-        """
-
-        @param instance:
-        @return: amount of training
-        """
-        return instance.training_count
-
-    training_count.short_description = "Кол-во тренировок"
-
-    def difficulty(self, instance: TrainingProgram) -> float:
-        """
-
-        @param instance:
-        @return: average difficulty of all trainings
-        """
-        return instance.difficulty
-
-    difficulty.short_description = "Сложность"
-
-    def avg_training_time(self, instance: TrainingProgram) -> timedelta | None:
-        """
-
-        @param instance:
-        @return: average duration of all trainings
-        """
-        return instance.avg_training_time
-
-    avg_training_time.short_description = "Среднее время одной тренировки"
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("group")
 
 
 @admin.register(Training)
@@ -118,26 +91,6 @@ class TrainingAdmin(admin.ModelAdmin):
     list_display = ("name", "difficulty", "approach_count", "time")
     list_filter = ["difficulty"]
 
-    def approach_count(self, instance: Training) -> int:
-        """
-
-        @param instance:
-        @return: amount of exercises
-        """
-        return instance.approach_count
-
-    approach_count.short_description = "Кол-во упражнений"
-
-    def time(self, instance: Training) -> timedelta:
-        """
-
-        @param instance:
-        @return: training time
-        """
-        return instance.time
-
-    time.short_description = "Время"
-
 
 @admin.register(Subscriber)
 class SubscriberAdmin(admin.ModelAdmin):
@@ -147,6 +100,9 @@ class SubscriberAdmin(admin.ModelAdmin):
 
     list_display = ("telegram_user", "gender", "is_adult")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("telegram_user")
+
     def is_adult(self, instance: Subscriber) -> bool | None:
         """
         age is over 18 or not
@@ -156,6 +112,7 @@ class SubscriberAdmin(admin.ModelAdmin):
         return instance.is_adult
 
     is_adult.boolean = True
+    is_adult.admin_order_field = "age"
     is_adult.short_description = "Взрослый"
 
 
@@ -173,6 +130,9 @@ class ApproachAdmin(admin.ModelAdmin):
 
     list_display_links = ["query_place", "training"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("training", "exercise")
+
 
 class ApproachInline(admin.TabularInline):
     """
@@ -211,3 +171,26 @@ class PortionAdmin(admin.ModelAdmin):
     """
 
     list_display = ("name", "calories", "proteins", "fats", "carbs")
+
+
+@admin.register(Purchase)
+class PurchaseAdmin(admin.ModelAdmin):
+    """
+    Purchase ledger Admin panel, entries are read only
+    """
+
+    list_display = ("telegram_user", "training_program", "sport_nutrition", "amount", "created_at")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            "telegram_user", "training_program", "sport_nutrition"
+        )
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        return False
@@ -1,6 +1,12 @@
 """Import modules for connecting signals and defining app config"""
 from django.apps import AppConfig
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 
 
 class AppConfig(AppConfig):  # pylint: disable=function-redefined
@@ -12,12 +18,54 @@ class AppConfig(AppConfig):  # pylint: disable=function-redefined
     name = "app"
 
     def ready(self) -> None:
+        from django.contrib.auth.models import Group  # pylint: disable=import-outside-toplevel
         from app import signals  # pylint: disable=import-outside-toplevel
         from app.models import (  # pylint: disable=import-outside-toplevel
             TrainingProgram,
+            Training,
             Exercise,
+            Approach,
+            SportNutrition,
+            Portion,
+            TrainingProgramGroup,
+            TelegramUser,
+            Subscriber,
         )
 
         for model in [TrainingProgram, Exercise]:
             pre_delete.connect(signals.delete_media, sender=model)
             pre_save.connect(signals.update_media, sender=model)
+
+        for model in [TrainingProgram, Training, SportNutrition, Portion]:
+            post_delete.connect(signals.record_tombstone, sender=model)
+
+        for signal in [post_save, post_delete]:
+            signal.connect(signals.touch_approach_parents, sender=Approach)
+        pre_delete.connect(signals.remember_training_programs, sender=Training)
+        for signal in [post_save, post_delete]:
+            signal.connect(signals.touch_training_parents, sender=Training)
+        post_save.connect(signals.touch_program_stats, sender=TrainingProgram)
+        post_save.connect(signals.touch_exercise_parents, sender=Exercise)
+        for signal in [post_save, post_delete]:
+            signal.connect(signals.touch_group_programs, sender=TrainingProgramGroup)
+        pre_delete.connect(signals.touch_deleted_program_trainings, sender=TrainingProgram)
+        m2m_changed.connect(
+            signals.touch_program_trainings, sender=TrainingProgram.trainings.through
+        )
+
+        for model in [
+            TrainingProgram, Training, Exercise, Approach,
+            SportNutrition, Portion, TrainingProgramGroup
+        ]:
+            post_save.connect(signals.invalidate_responses, sender=model)
+            post_delete.connect(signals.invalidate_responses, sender=model)
+        m2m_changed.connect(
+            signals.invalidate_membership_responses, sender=TrainingProgram.trainings.through
+        )
+
+        for model in [TelegramUser, Subscriber]:
+            post_save.connect(signals.invalidate_user_snapshot, sender=model)
+            post_delete.connect(signals.invalidate_user_snapshot, sender=model)
+        m2m_changed.connect(signals.invalidate_user_groups, sender=TelegramUser.groups.through)
+        post_save.connect(signals.invalidate_group_members, sender=Group)
+        pre_delete.connect(signals.invalidate_group_members, sender=Group)
@@ -0,0 +1,143 @@
+"""Import modules that work with asynchronous views"""
+import asyncio
+from typing import AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+
+from app.conditional import aqueryset_etag, etag_matches, not_modified
+from app.pagination import IdCursorPagination
+
+
+class AsyncApiView(generics.GenericAPIView):
+    """
+    Generic api view with coroutine handlers. Authentication, permissions
+    and throttling stay sync and run in a thread, handlers use async ORM
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncRetrieveApi(AsyncApiView):
+    """
+    Single object by url kwarg, answered with 304 if it was not changed
+    """
+
+    lookup_url_kwarg = "pk"
+
+    async def get(self, request, **kwargs):  # pylint: disable=unused-argument
+        queryset = self.get_queryset().filter(pk=kwargs.get(self.lookup_url_kwarg))
+        etag = await aqueryset_etag(queryset)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        instance = await queryset.afirst()
+        if instance is None:
+            raise NotFound()
+        data = self.get_serializer().to_representation(instance)
+        return Response(data, status=HTTP_200_OK, headers={"ETag": etag})
+
+
+class AsyncListApi(AsyncApiView):
+    """
+    List of objects with the same contract as sync list views:
+    etag, cursor pagination (?cursor, ?page_size) and streaming (?stream=true)
+    """
+
+    pagination_class = IdCursorPagination
+    stream_query_param = "stream"
+    stream_chunk_size = 500
+
+    async def get(self, request, **kwargs):  # pylint: disable=unused-argument
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = await aqueryset_etag(queryset, request.META.get("QUERY_STRING", ""))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        if request.query_params.get(self.stream_query_param) in ("1", "true"):
+            response = StreamingHttpResponse(
+                self.stream(queryset), content_type="application/json"
+            )
+            response["ETag"] = etag
+            return response
+
+        page = await sync_to_async(self.paginate_queryset)(queryset)
+        if page is not None:
+            response = self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            )
+        else:
+            instances = [instance async for instance in queryset]
+            response = Response(self.get_serializer(instances, many=True).data)
+        response["ETag"] = etag
+        return response
+
+    async def stream(self, queryset) -> AsyncIterator[bytes]:
+        """
+        Serialize queryset chunk by chunk, prefetching relations per chunk.
+        Rows are read with a server-side cursor unless DB_CONNECTION_MODE is
+        pgbouncer, then the whole result set is fetched before the first chunk
+        @param queryset:
+        @return: JSON array parts
+        """
+        renderer = JSONRenderer()
+        lookups = queryset._prefetch_related_lookups  # pylint: disable=protected-access
+        rows = queryset.prefetch_related(None).aiterator(chunk_size=self.stream_chunk_size)
+        separator, chunk = b"[", []
+
+        async for instance in rows:
+            chunk.append(instance)
+            if len(chunk) < self.stream_chunk_size:
+                continue
+            for part in await self.render_chunk(renderer, chunk, lookups):
+                yield separator + part
+                separator = b","
+            chunk = []
+        for part in await self.render_chunk(renderer, chunk, lookups):
+            yield separator + part
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+
+    async def render_chunk(self, renderer, chunk: list, lookups) -> list[bytes]:
+        """
+        @param renderer:
+        @param chunk: model instances
+        @param lookups: prefetch_related lookups of the queryset
+        @return: rendered rows
+        """
+        if chunk and lookups:
+            await sync_to_async(prefetch_related_objects)(chunk, *lookups)
+        return [
+            renderer.render(data)
+            for data in self.get_serializer(chunk, many=True).data
+        ]
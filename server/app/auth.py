@@ -1,10 +1,56 @@
 """Import modules that work with authentication"""
+import time
+from uuid import uuid4
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 
 from app.models import TelegramUser
 
 
+def user_version_key(user_id) -> str:
+    """
+    @param user_id: telegram id
+    @return: cache key of user data version
+    """
+    return f"auth-version:{user_id}"
+
+
+def invalidate_user(user_id) -> None:
+    """
+    Change data version of user, so snapshots cached for
+    any of user tokens are never read again
+    @param user_id: telegram id
+    """
+    cache.set(user_version_key(user_id), uuid4().hex, timeout=None)
+
+
+def group_names(user: TelegramUser) -> frozenset:
+    """
+    Names of user groups, cached until user data version changes
+    (membership changes and group renames change it too)
+    @param user:
+    @return:
+    """
+    key, version_key = f"auth-groups:{user.telegram_id}", user_version_key(user.telegram_id)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key)
+    if version is not None and key in cached and cached[key][0] == version:
+        return cached[key][1]
+
+    names = frozenset(user.groups.values_list("name", flat=True))
+    if version is None:
+        cache.add(version_key, uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    cache.set(key, (version, names), timeout=None)
+    return names
+
+
 class TelegramAuthBackend(ModelBackend):
     """
     Telegram user authentication
@@ -35,3 +81,50 @@ class TelegramAuthBackend(ModelBackend):
             return TelegramUser.objects.get(pk=user_id)
         except TelegramUser.DoesNotExist:  # pylint: disable=no-member
             return None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps user snapshot (with subscriber) by token id,
+    so authenticated requests do not query user and subscriber
+    """
+
+    cache_timeout = settings.AUTH_CACHE_TIMEOUT
+
+    def get_user(self, validated_token) -> TelegramUser:
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            token_id = validated_token[api_settings.JTI_CLAIM]
+        except KeyError as error:
+            raise InvalidToken("Token contained no recognizable user identification") from error
+
+        key, version_key = f"auth-user:{token_id}", user_version_key(user_id)
+        cached = cache.get_many([key, version_key])
+        version = cached.get(version_key)
+        if version is not None and key in cached and cached[key][0] == version:
+            user = cached[key][1]
+        else:
+            user = self.load_user(user_id)
+            if version is None:
+                cache.add(version_key, uuid4().hex, timeout=None)
+                version = cache.get(version_key)
+            timeout = min(self.cache_timeout, validated_token.get("exp", 0) - time.time())
+            if timeout > 0:
+                cache.set(key, (version, user), int(timeout) or 1)
+
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+    @staticmethod
+    def load_user(user_id) -> TelegramUser:
+        """
+        @param user_id: telegram id
+        @return: user with subscriber loaded
+        """
+        try:
+            return TelegramUser.objects.select_related("subscriber").get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except TelegramUser.DoesNotExist as error:  # pylint: disable=no-member
+            raise AuthenticationFailed("User not found", code="user_not_found") from error
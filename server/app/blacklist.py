@@ -0,0 +1,152 @@
+"""Import modules that work with token blacklist"""
+import hashlib
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from app.models import BlacklistedToken
+
+
+class BloomFilter:
+    """
+    Set of strings answering "definitely absent" or "maybe present"
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1024)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+
+    def positions(self, item: str):
+        """
+        @param item:
+        @return: bit positions of item, derived from two halves of one digest
+        """
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big")
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.size
+
+    def add(self, item: str) -> None:
+        """
+        @param item:
+        """
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item)
+        )
+
+
+class TokenBlacklist:
+    """
+    Per worker blacklist of refresh tokens. The Bloom filter is rebuilt from
+    the database every TOKEN_BLACKLIST_REBUILD_INTERVAL seconds, and tokens
+    blacklisted by other workers are added to it by a query for recent rows
+    made at most every TOKEN_BLACKLIST_SYNC_INTERVAL seconds, so checking a
+    token that is not blacklisted does no I/O between these queries
+    """
+
+    def __init__(self):
+        self.filter = None
+        self.built_at = 0.
+        self.synced_at = 0.
+        self.synced = None
+
+    def rebuild(self) -> None:
+        """
+        Load ids of unexpired blacklisted tokens into a new filter,
+        and prune expired ones if no other worker did it recently
+        """
+        if cache.add("token-blacklist-prune", 1, timeout=settings.TOKEN_BLACKLIST_PRUNE_INTERVAL):
+            prune()
+        synced = timezone.now()
+        tokens = BlacklistedToken.objects.filter(expires_at__gt=synced)
+        bloom = BloomFilter(tokens.count(), settings.TOKEN_BLACKLIST_ERROR_RATE)
+        for jti in tokens.values_list("jti", flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        self.filter, self.built_at = bloom, time.monotonic()
+        self.synced, self.synced_at = synced, self.built_at
+
+    def sync(self) -> None:
+        """
+        Add tokens blacklisted since previous sync. The window starts one
+        interval earlier, so rows committed shortly after they were created
+        are not missed
+        """
+        synced = timezone.now()
+        since = self.synced - timedelta(seconds=settings.TOKEN_BLACKLIST_SYNC_INTERVAL)
+        for jti in BlacklistedToken.objects.filter(
+                created_at__gte=since
+        ).values_list("jti", flat=True):
+            self.filter.add(jti)
+        self.synced, self.synced_at = synced, time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        """
+        @return: filter was not built or is older than rebuild interval
+        """
+        age = time.monotonic() - self.built_at
+        return self.filter is None or age > settings.TOKEN_BLACKLIST_REBUILD_INTERVAL
+
+    def __contains__(self, jti: str) -> bool:
+        if self.stale:
+            self.rebuild()
+        elif time.monotonic() - self.synced_at > settings.TOKEN_BLACKLIST_SYNC_INTERVAL:
+            self.sync()
+        if jti not in self.filter:
+            return False
+        return BlacklistedToken.objects.filter(jti=jti).exists()
+
+    def add(self, jti: str, expires_at) -> None:
+        """
+        @param jti: token id
+        @param expires_at: token expiration, row is pruned after it
+        """
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True
+        )
+        if self.filter is not None:
+            self.filter.add(jti)
+
+
+def prune() -> int:
+    """
+    Delete expired entries with one statement, expired tokens are rejected anyway
+    @return: amount of deleted entries
+    """
+    return BlacklistedToken.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+token_blacklist = TokenBlacklist()
+
+
+class BlacklistRefreshToken(RefreshToken):
+    """
+    Refresh token checked against and added to token blacklist
+    """
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if self.payload[api_settings.JTI_CLAIM] in token_blacklist:
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self) -> None:
+        """
+        Blacklist token until it expires
+        """
+        token_blacklist.add(
+            self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload["exp"])
+        )
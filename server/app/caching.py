@@ -0,0 +1,77 @@
+"""Import modules that work with response cache"""
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+
+from app.conditional import etag_matches, not_modified
+
+
+def version_key(model: type[Model]) -> str:
+    """
+    @param model:
+    @return: cache key of model data version
+    """
+    return f"response-version:{model._meta.label_lower}"  # pylint: disable=protected-access
+
+
+def invalidate(*models: type[Model]) -> None:
+    """
+    Change data version of models, so responses cached for
+    previous version are never read again and expire
+    @param models:
+    """
+    cache.set_many({version_key(model): uuid4().hex for model in models}, timeout=None)
+
+
+async def get_versions(models) -> list[str]:
+    """
+    @param models:
+    @return: current data versions of models
+    """
+    keys = [version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in set(keys).difference(versions):
+        await cache.aadd(key, uuid4().hex, timeout=None)
+        versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+class ResponseCacheMixin:
+    """
+    Caches successful GET responses of async views per url (path and query string)
+    and data version of every model representation depends on (cache_models)
+    """
+
+    cache_models: tuple = ()
+    cache_timeout = settings.RESPONSE_CACHE_TIMEOUT
+
+    async def get_cache_key(self, request) -> str:
+        """
+        @param request:
+        @return: response cache key
+        """
+        versions = await get_versions(self.cache_models)
+        string = ":".join([self.__class__.__name__, *versions, request.get_full_path()])
+        return f"response:{hashlib.sha1(string.encode('utf-8')).hexdigest()}"
+
+    async def get(self, request, **kwargs):
+        stream_param = getattr(self, "stream_query_param", None)
+        if not self.cache_models or request.query_params.get(stream_param) in ("1", "true"):
+            return await super().get(request, **kwargs)
+
+        key = await self.get_cache_key(request)
+        if (cached := await cache.aget(key)) is not None:
+            etag, data = cached
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            return Response(data, status=HTTP_200_OK, headers={"ETag": etag})
+
+        response = await super().get(request, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            await cache.aset(key, (response["ETag"], response.data), self.cache_timeout)
+        return response
@@ -0,0 +1,210 @@
+"""Import modules that work with catalog bundles"""
+import csv
+import json
+import os
+from typing import Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+
+from app.caching import invalidate
+from app.models import (
+    Approach,
+    Exercise,
+    Portion,
+    SportNutrition,
+    Training,
+    TrainingProgram,
+    TrainingProgramGroup,
+)
+
+
+class CatalogEntity:
+    """
+    Catalog model (or m2m table) moved as flat rows: source id, plain
+    fields and source ids of related entities
+    """
+
+    def __init__(self, name: str, model: type[models.Model], relations: dict = None):
+        self.name = name
+        self.model = model
+        self.relations = relations or {}
+        self.fields = [
+            field for field in model._meta.concrete_fields  # pylint: disable=protected-access
+            if field.editable and not field.primary_key
+        ]
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        @return: row keys
+        """
+        return ["id", *(field.name for field in self.fields)]
+
+    def export(self, chunk_size: int) -> Iterator[dict]:
+        """
+        Stream rows ordered by id without caching the queryset
+        @param chunk_size: rows fetched per database round trip
+        @return: rows
+        """
+        rows = self.model.objects.order_by("pk").values_list(
+            "pk", *(field.attname for field in self.fields)
+        )
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield dict(zip(self.columns, row))
+
+    def build(self, row: dict, ids: dict, blank_is_null: bool = False) -> models.Model:
+        """
+        @param row: source row, values may be strings (csv)
+        @param ids: source id to new id maps by entity name
+        @param blank_is_null: treat empty strings of nullable fields as null
+        @return: unsaved instance with remapped relations
+        """
+        instance = self.model()
+        for field in self.fields:
+            if field.name not in row:
+                continue
+            value = row[field.name]
+            if blank_is_null and value == "" and field.null:
+                value = None
+            if field.name in self.relations and value is not None:
+                try:
+                    value = ids[self.relations[field.name]][int(value)]
+                except KeyError as error:
+                    raise ValueError(
+                        f"{self.name} {row.get('id')}: unknown {field.name} {value}"
+                    ) from error
+            setattr(instance, field.attname, field.to_python(value))
+        return instance
+
+
+ENTITIES = {
+    entity.name: entity for entity in [
+        CatalogEntity("trainingprogramgroup", TrainingProgramGroup),
+        CatalogEntity("exercise", Exercise),
+        CatalogEntity("training", Training),
+        CatalogEntity("approach", Approach, {"training": "training", "exercise": "exercise"}),
+        CatalogEntity("trainingprogram", TrainingProgram, {"group": "trainingprogramgroup"}),
+        CatalogEntity(
+            "trainingprogram_trainings",
+            TrainingProgram.trainings.through,
+            {"trainingprogram": "trainingprogram", "training": "training"}
+        ),
+        CatalogEntity("sportnutrition", SportNutrition),
+        CatalogEntity("portion", Portion, {"sport_nutrition": "sportnutrition"}),
+    ]
+}
+
+
+def write_jsonl(file, chunk_size: int) -> dict:
+    """
+    Write every entity as {"model": name, **row} lines in dependency order
+    @param file: text file
+    @param chunk_size:
+    @return: amount of rows by entity name
+    """
+    counts = {}
+    for name, entity in ENTITIES.items():
+        counts[name] = 0
+        for row in entity.export(chunk_size):
+            file.write(json.dumps({"model": name, **row}, cls=DjangoJSONEncoder, ensure_ascii=False))
+            file.write("\n")
+            counts[name] += 1
+    return counts
+
+
+def write_csv(directory: str, chunk_size: int) -> dict:
+    """
+    Write every entity into <directory>/<name>.csv
+    @param directory:
+    @param chunk_size:
+    @return: amount of rows by entity name
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for name, entity in ENTITIES.items():
+        counts[name] = 0
+        with open(os.path.join(directory, f"{name}.csv"), "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=entity.columns)
+            writer.writeheader()
+            for row in entity.export(chunk_size):
+                writer.writerow(row)
+                counts[name] += 1
+    return counts
+
+
+def read_jsonl(file) -> Iterator[tuple[str, dict]]:
+    """
+    @param file: text file
+    @return: entity name and row pairs
+    """
+    for line in file:
+        if line.strip():
+            row = json.loads(line)
+            yield row.pop("model"), row
+
+
+def read_csv(directory: str) -> Iterator[tuple[str, dict]]:
+    """
+    @param directory: directory with <name>.csv files, missing files are skipped
+    @return: entity name and row pairs in dependency order
+    """
+    for name in ENTITIES:
+        path = os.path.join(directory, f"{name}.csv")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8", newline="") as file:
+                for row in csv.DictReader(file):
+                    yield name, row
+
+
+class CatalogImporter:
+    """
+    Loads rows with bulk_create batches, remapping source ids to new ids,
+    so bundles are added next to existing catalog
+    """
+
+    def __init__(self, batch_size: int = 1000, blank_is_null: bool = False):
+        self.batch_size = batch_size
+        self.blank_is_null = blank_is_null
+        self.ids = {name: {} for name in ENTITIES}
+        self.counts = {name: 0 for name in ENTITIES}
+
+    def flush(self, name: str, rows: list[dict]) -> None:
+        """
+        Insert one batch of rows of the same entity
+        @param name: entity name
+        @param rows:
+        """
+        entity = ENTITIES[name]
+        instances = entity.model.objects.bulk_create(
+            [entity.build(row, self.ids, self.blank_is_null) for row in rows]
+        )
+        for row, instance in zip(rows, instances):
+            if row.get("id") not in (None, ""):
+                self.ids[name][int(row["id"])] = instance.pk
+        self.counts[name] += len(instances)
+
+    def load(self, records) -> dict:
+        """
+        Import rows atomically. Bulk inserts skip model signals, so
+        materialized stats and response cache are refreshed afterwards
+        @param records: entity name and row pairs, related entities first
+        @return: amount of imported rows by entity name
+        """
+        with transaction.atomic():
+            name, rows = None, []
+            for record_name, row in records:
+                if record_name not in ENTITIES:
+                    raise ValueError(f"Unknown catalog entity: {record_name}")
+                if rows and (record_name != name or len(rows) >= self.batch_size):
+                    self.flush(name, rows)
+                    rows = []
+                name = record_name
+                rows.append(row)
+            if rows:
+                self.flush(name, rows)
+
+            Training.objects.refresh_stats()
+            TrainingProgram.objects.refresh_stats()
+        invalidate(*(entity.model for entity in ENTITIES.values()))
+        return self.counts
@@ -0,0 +1,55 @@
+"""Import modules that work with conditional requests"""
+import hashlib
+
+from django.db.models import Count, Max, QuerySet
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED
+
+
+def format_etag(version: dict, *parts) -> str:
+    """
+    @param version: last update and amount of rows
+    @param parts: other values representation depends on
+    @return: quoted etag
+    """
+    string = ":".join(
+        str(value) for value in (version["updated_at"], version["count"], *parts)
+    )
+    return f'"{hashlib.sha1(string.encode("utf-8")).hexdigest()}"'
+
+
+async def aqueryset_etag(queryset: QuerySet, *parts) -> str:
+    """
+    Strong etag built from rows version (last update and amount). Nested
+    related rows are not read, their changes touch updated_at of the rows
+    which represent them (see app.signals)
+    @param queryset: rows of representation
+    @param parts: other values representation depends on
+    @return: quoted etag
+    """
+    version = await queryset.order_by().aaggregate(
+        updated_at=Max("updated_at"), count=Count("pk")
+    )
+    return format_etag(version, *parts)
+
+
+def etag_matches(request, etag: str | None) -> bool:
+    """
+    Check If-None-Match header
+    @param request:
+    @param etag:
+    @return: client representation is up to date
+    """
+    if etag is None:
+        return False
+    etags = parse_etags(request.headers.get("If-None-Match", ""))
+    return etag in etags or "*" in etags
+
+
+def not_modified(etag: str) -> Response:
+    """
+    @param etag:
+    @return: 304 response without body
+    """
+    return Response(status=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
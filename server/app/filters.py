@@ -1,7 +1,7 @@
 import re
 from datetime import timedelta
-from typing import Callable
 
+from django.db.models import Q
 from rest_framework.filters import BaseFilterBackend
 import coreapi
 
@@ -98,15 +98,26 @@ class ApproachFilterBackend(BaseFilterBackend):
         return [training_id]
 
 
+class SyncFilterBackend(BaseFilterBackend):
+    def get_schema_fields(self, view):
+        since = coreapi.Field(
+            name='since',
+            location='query',
+            required=False,
+            type='string'
+        )
+        return [since]
+
+
 class DataFilter:
 
     EXP_FORMAT = r"(?:[<>]=?|=)"
-    FILTER_EXP = {
-        "<": "__gt__",
-        "<=": "__ge__",
-        ">": "__lt__",
-        ">=": "__le__",
-        "=": "__eq__"
+    LOOKUP_EXP = {
+        "<": "lt",
+        "<=": "lte",
+        ">": "gt",
+        ">=": "gte",
+        "=": "exact"
     }
     PATTERNS = {
         float: r'([0-9]*[.])?[0-9]+',
@@ -116,18 +127,26 @@ class DataFilter:
     }
 
     @classmethod
-    def filter(
-            cls, string: str | None, data_class
-    ) -> Callable:
+    def lookup(
+            cls, string: str | None, data_class, field: str
+    ) -> Q:
+        """
+        Translate filter expression to django lookup
+        @param string: expression, e.g. ">=3.5"
+        @param data_class: type of compared value
+        @param field: model field or annotation name
+        @return: Q object (empty if expression is not valid)
+        """
         if string is not None:
             value_match, op_match = (
                 re.search(cls.PATTERNS[data_class], string),
                 re.search(cls.EXP_FORMAT, string)
             )
             if value_match and op_match:
-                op, value = (
-                    cls.FILTER_EXP[op_match.group(0)],
-                    data_class(value_match.group(0))
+                op = op_match.group(0)
+                value = (
+                    string[op_match.end():] if data_class is str
+                    else data_class(value_match.group(0))
                 )
-                return getattr(value, op)
-        return lambda val: True
+                return Q(**{f"{field}__{cls.LOOKUP_EXP[op]}": value})
+        return Q()
@@ -0,0 +1,217 @@
+"""Import modules that work with connection benchmark"""
+import asyncio
+import io
+import json
+import sys
+import time
+from statistics import mean, median, quantiles
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.models import TelegramUser
+
+
+class Command(BaseCommand):
+    """
+    Compare /api/token/ and /api/user/ latency per database connection mode
+    """
+
+    help = (
+        "Benchmark /api/token/ and /api/user/ with and without persistent DB connections. "
+        "Production is served by server.asgi, so requests go through ASGIHandler by default"
+    )
+    modes = {
+        "none": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+        "persistent": {"CONN_MAX_AGE": None, "CONN_HEALTH_CHECKS": True},
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--modes", nargs="+", choices=list(self.modes), default=list(self.modes)
+        )
+        parser.add_argument("--interface", choices=["asgi", "wsgi"], default="asgi")
+
+    @staticmethod
+    def host() -> str:
+        """
+        @return: host allowed by settings
+        """
+        return settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+
+    def environ(self, method: str, path: str, body: bytes = b"", **headers) -> dict:
+        """
+        Build a WSGI environ, so requests go through the request_started and
+        request_finished signals that open and close connections
+        @param method:
+        @param path:
+        @param body:
+        @param headers:
+        @return: environ
+        """
+        return {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "SERVER_NAME": self.host(),
+            "SERVER_PORT": "80",
+            "HTTP_HOST": self.host(),
+            "REMOTE_ADDR": "127.0.0.1",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            **headers,
+        }
+
+    def scope(self, method: str, path: str, body: bytes = b"", **headers) -> tuple[dict, bytes]:
+        """
+        Build an ASGI scope, sync parts of the request then run in a thread
+        per request as they do under uvicorn
+        @param method:
+        @param path:
+        @param body:
+        @param headers: WSGI style names (HTTP_AUTHORIZATION)
+        @return: scope and body
+        """
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", self.host().encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *(
+                    (key.removeprefix("HTTP_").replace("_", "-").lower().encode(), value.encode())
+                    for key, value in headers.items()
+                ),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": (self.host(), 80),
+        }, body
+
+    @staticmethod
+    def request(handler: WSGIHandler, environ: dict) -> tuple[float, bytes]:
+        """
+        Send one request and measure it
+        @param handler:
+        @param environ:
+        @return: latency in ms and response body
+        """
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: None)
+        content = b"".join(response)
+        response.close()
+        return (time.perf_counter() - start) * 1000, content
+
+    @staticmethod
+    async def arequest(handler: ASGIHandler, request: tuple[dict, bytes]) -> tuple[float, bytes]:
+        """
+        Send one ASGI request and measure it
+        @param handler:
+        @param request: scope and body
+        @return: latency in ms and response body
+        """
+        scope, body = request
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        chunks = []
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        return (time.perf_counter() - start) * 1000, b"".join(chunks)
+
+    def measure(self, interface: str, user: dict, count: int) -> dict:
+        """
+        Measure both endpoints
+        @param interface: asgi or wsgi
+        @param user:
+        @param count:
+        @return: latency statistics per path
+        """
+        if interface == "asgi":
+            handler, build = ASGIHandler(), self.scope
+
+            def send(request):
+                return asyncio.run(self.arequest(handler, request))
+        else:
+            handler, build = WSGIHandler(), self.environ
+
+            def send(request):
+                return self.request(handler, request)
+
+        body = json.dumps(user).encode()
+        token = json.loads(send(build("POST", "/api/token/", body))[1])["access"]
+        requests = {
+            "/api/token/": lambda: build("POST", "/api/token/", body),
+            "/api/user/": lambda: build(
+                "GET", "/api/user/", HTTP_AUTHORIZATION=f"Bearer {token}"
+            ),
+        }
+        results = {}
+        for path, request in requests.items():
+            latencies = [send(request())[0] for _ in range(count)]
+            results[path] = {
+                "mean": round(mean(latencies), 3),
+                "p50": round(median(latencies), 3),
+                "p99": round(quantiles(latencies, n=100)[-1], 3),
+            }
+        return results
+
+    @staticmethod
+    def open_connections() -> int | None:
+        """
+        @return: connections to benchmark database left open after the run
+        """
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+            )
+            return cursor.fetchone()[0]
+
+    def handle(self, *args, **options):
+        user = {"telegram_id": f"benchmark-{uuid4().hex[:16]}", "chat_id": uuid4().hex}
+        TelegramUser.objects.create_user(**user)
+        original = dict(connection.settings_dict)
+        report, connections = {}, {}
+        try:
+            for mode in options["modes"]:
+                connection.close()
+                connection.settings_dict.update(self.modes[mode])
+                report[mode] = self.measure(options["interface"], user, options["requests"])
+                connections[mode] = self.open_connections()
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+            TelegramUser.objects.filter(telegram_id=user["telegram_id"]).delete()
+
+        for mode, results in report.items():
+            for path, values in results.items():
+                self.stdout.write(
+                    f"{options['interface']:<6}{mode:<12}{path:<14}"
+                    + "  ".join(f"{key}={value}ms" for key, value in values.items())
+                )
+            if connections[mode] is not None:
+                self.stdout.write(
+                    f"{options['interface']:<6}{mode:<12}open connections: {connections[mode]}"
+                )
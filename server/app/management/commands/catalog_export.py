@@ -0,0 +1,31 @@
+"""Import modules that work with catalog export"""
+import sys
+
+from django.core.management.base import BaseCommand
+
+from app.catalog import write_csv, write_jsonl
+
+
+class Command(BaseCommand):
+    """
+    Stream catalog into a JSONL file (or stdout) or a directory of CSV files
+    """
+
+    help = "Export exercises, trainings, approaches, programs, nutrition and portions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file, '-' for stdout, or CSV directory")
+        parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path, chunk_size = options["path"], options["chunk_size"]
+        if options["format"] == "csv":
+            counts = write_csv(path, chunk_size)
+        elif path == "-":
+            counts = write_jsonl(sys.stdout, chunk_size)
+        else:
+            with open(path, "w", encoding="utf-8") as file:
+                counts = write_jsonl(file, chunk_size)
+
+        self.stderr.write(", ".join(f"{name}: {count}" for name, count in counts.items()))
@@ -0,0 +1,38 @@
+"""Import modules that work with catalog import"""
+import sys
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from app.catalog import CatalogImporter, read_csv, read_jsonl
+
+
+class Command(BaseCommand):
+    """
+    Load catalog bundle written by catalog_export, assigning new ids
+    """
+
+    help = "Import exercises, trainings, approaches, programs, nutrition and portions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file, '-' for stdin, or CSV directory")
+        parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        importer = CatalogImporter(
+            batch_size=options["batch_size"], blank_is_null=options["format"] == "csv"
+        )
+        try:
+            if options["format"] == "csv":
+                counts = importer.load(read_csv(path))
+            elif path == "-":
+                counts = importer.load(read_jsonl(sys.stdin))
+            else:
+                with open(path, encoding="utf-8") as file:
+                    counts = importer.load(read_jsonl(file))
+        except (KeyError, ValueError, ValidationError) as error:
+            raise CommandError(f"Catalog was not imported: {error}") from error
+
+        self.stdout.write(", ".join(f"{name}: {count}" for name, count in counts.items()))
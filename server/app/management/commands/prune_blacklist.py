@@ -0,0 +1,15 @@
+"""Import modules that work with token blacklist"""
+from django.core.management.base import BaseCommand
+
+from app.blacklist import prune
+
+
+class Command(BaseCommand):
+    """
+    Delete expired blacklisted tokens
+    """
+
+    help = "Delete blacklisted refresh tokens which have expired, run it from cron"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Pruned {prune()} expired blacklisted tokens")
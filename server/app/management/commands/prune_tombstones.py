@@ -0,0 +1,25 @@
+"""Import modules that work with sync tombstones"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import Tombstone
+
+
+class Command(BaseCommand):
+    """
+    Delete tombstones older than sync retention
+    """
+
+    help = (
+        "Delete tombstones older than SYNC_RETENTION, clients with an older cursor "
+        "get a full sync instead. Run it from cron"
+    )
+
+    def handle(self, *args, **options):
+        deleted = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(seconds=settings.SYNC_RETENTION)
+        ).delete()[0]
+        self.stdout.write(f"Pruned {deleted} tombstones")
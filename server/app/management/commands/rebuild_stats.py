@@ -0,0 +1,21 @@
+"""Import modules that work with materialized statistics"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.caching import invalidate
+from app.models import Training, TrainingProgram
+
+
+class Command(BaseCommand):
+    """
+    Recompute materialized training and program statistics
+    """
+
+    help = "Rebuild time, approach_count, training_count, difficulty and avg_training_time"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            trainings = Training.objects.refresh_stats()
+            programs = TrainingProgram.objects.refresh_stats()
+        invalidate(Training, TrainingProgram)
+        self.stdout.write(f"Rebuilt stats of {trainings} trainings and {programs} programs")
@@ -1,5 +1,30 @@
-"""Import base user manager module"""
+"""Import base user manager module and query expressions"""
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def approach_duration(prefix: str = "") -> ExpressionWrapper:
+    """
+    Duration of approach including rest: (time + rest) * amount
+    @param prefix: lookup path from queried model to approach
+    @return: expression
+    """
+    return ExpressionWrapper(
+        (F(f"{prefix}time") + F(f"{prefix}rest")) * Cast(f"{prefix}amount", IntegerField()),
+        output_field=DurationField()
+    )
 
 
 class TelegramUserManager(BaseUserManager):
@@ -46,3 +71,73 @@ class TelegramUserManager(BaseUserManager):
             raise ValueError("Superuser must have is_superuser=True")
 
         return self.create_user(telegram_id, chat_id, **extra_fields)
+
+
+class TrainingProgramQuerySet(models.QuerySet):
+    """
+    Training program queryset
+    """
+
+    def refresh_stats(self, **fields) -> int:
+        """
+        Recompute training_count, difficulty and avg_training_time of every
+        program in one UPDATE with correlated subqueries over materialized
+        training stats, so training stats must be refreshed first
+        @param fields: other fields to update with the same query
+        @return: amount of updated programs
+        """
+        from app.models import Training  # pylint: disable=import-outside-toplevel
+
+        trainings = Training.objects.filter(  # pylint: disable=no-member
+            training_program_set=OuterRef("pk")
+        ).order_by().values("training_program_set")
+        training_count = Coalesce(
+            Subquery(trainings.annotate(count=Count("pk")).values("count")),
+            0
+        )
+
+        return self.update(
+            training_count=training_count,
+            difficulty=Subquery(
+                trainings.annotate(avg=Avg("difficulty")).values("avg")
+            ),
+            avg_training_time=ExpressionWrapper(
+                Subquery(
+                    trainings.annotate(total=Sum("time")).values("total"),
+                    output_field=DurationField()
+                ) / Cast(NullIf(training_count, 0), IntegerField()),
+                output_field=DurationField()
+            ),
+            **fields
+        )
+
+
+class TrainingQuerySet(models.QuerySet):
+    """
+    Training queryset
+    """
+
+    def refresh_stats(self, **fields) -> int:
+        """
+        Recompute time and approach_count of every training
+        in one UPDATE with correlated subqueries
+        @param fields: other fields to update with the same query
+        @return: amount of updated trainings
+        """
+        from app.models import Approach  # pylint: disable=import-outside-toplevel
+
+        approaches = Approach.objects.filter(  # pylint: disable=no-member
+            training=OuterRef("pk")
+        ).order_by().values("training")
+
+        return self.update(
+            time=Subquery(
+                approaches.annotate(time=Sum(approach_duration())).values("time"),
+                output_field=DurationField()
+            ),
+            approach_count=Coalesce(
+                Subquery(approaches.annotate(count=Count("pk")).values("count")),
+                0
+            ),
+            **fields
+        )
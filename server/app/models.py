@@ -4,16 +4,14 @@ Import modules for describing tables and queries
 Import Telegram user manager module
 """
 import hashlib
-from datetime import timedelta
 from typing import List
 
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Avg, F, Sum, ExpressionWrapper
 
-from app.managers import TelegramUserManager
+from app.managers import TelegramUserManager, TrainingProgramQuerySet, TrainingQuerySet
 
 
 class TelegramUser(AbstractUser):
@@ -185,6 +183,74 @@ class Subscriber(models.Model):
         verbose_name_plural = "Подписчики"
 
 
+class Purchase(models.Model):
+    """
+    Purchase ledger entry, rows are only appended
+    """
+
+    telegram_user = models.ForeignKey(
+        TelegramUser,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        related_name="purchases",
+        related_query_name="purchase_set",
+    )
+    training_program = models.ForeignKey(
+        "TrainingProgram",
+        verbose_name="Тренировочная программа",
+        on_delete=models.SET_NULL,
+        related_name="purchases",
+        related_query_name="purchase_set",
+        null=True,
+        blank=True,
+    )
+    sport_nutrition = models.ForeignKey(
+        "SportNutrition",
+        verbose_name="Спортивное питание",
+        on_delete=models.SET_NULL,
+        related_name="purchases",
+        related_query_name="purchase_set",
+        null=True,
+        blank=True,
+    )
+    amount = models.FloatField(verbose_name="Сумма")
+    idempotency_key = models.CharField(verbose_name="Ключ идемпотентности", max_length=64)
+    created_at = models.DateTimeField(verbose_name="Дата покупки", auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.telegram_user}, сумма: {self.amount}"
+
+    class Meta:  # pylint: disable=too-few-public-methods
+        """
+        Meta data
+        """
+
+        verbose_name = "Покупка"
+        verbose_name_plural = "Покупки"
+        unique_together = ("telegram_user", "idempotency_key")
+
+
+class BlacklistedToken(models.Model):
+    """
+    Refresh token which can not be used anymore
+    """
+
+    jti = models.CharField(verbose_name="Идентификатор токена", max_length=255, unique=True)
+    expires_at = models.DateTimeField(verbose_name="Истекает", db_index=True)
+    created_at = models.DateTimeField(verbose_name="Отозван", auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti}"
+
+    class Meta:  # pylint: disable=too-few-public-methods
+        """
+        Meta data
+        """
+
+        verbose_name = "Отозванный токен"
+        verbose_name_plural = "Отозванные токены"
+
+
 class TrainingProgramGroup(models.Model):
     name = models.CharField(verbose_name="Название", max_length=64)
     description = models.TextField(verbose_name="Описание", null=True, blank=True)
@@ -206,6 +272,8 @@ class TrainingProgram(models.Model):
     Training program model
     """
 
+    objects = TrainingProgramQuerySet.as_manager()
+
     name = models.CharField(verbose_name="Название", max_length=64)
     description = models.TextField(verbose_name="Описание")
     image = models.FileField(verbose_name="Изображение", upload_to="images/program")
@@ -228,51 +296,22 @@ class TrainingProgram(models.Model):
         null=True,
         blank=True
     )
+    training_count = models.PositiveIntegerField(
+        verbose_name="Кол-во тренировок", default=0, editable=False
+    )
+    difficulty = models.FloatField(
+        verbose_name="Сложность", null=True, blank=True, editable=False
+    )
+    avg_training_time = models.DurationField(
+        verbose_name="Среднее время одной тренировки", null=True, blank=True, editable=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.name}, сложность: {self.difficulty}"
 
-    @property
-    def avg_training_time(self) -> timedelta | None:
-        """
-        average training time
-        @return: timedelta
-        """
-        trainings = Training.objects.filter(  # pylint: disable=no-member
-            training_program_set=self
-        )
-        output = trainings.aggregate(
-            time=Sum(
-                ExpressionWrapper(
-                    (F("approach_set__time") + F("approach_set__rest")) * F("approach_set__amount"),
-                    output_field=models.DurationField())
-            )
-        )
-        if time := output.get("time"):
-            return time / len(trainings)
-
-    @property
-    def training_count(self) -> int:
-        """
-        training amount
-        @return: int
-        """
-        count = Training.objects.filter(  # pylint: disable=no-member
-            training_program_set=self
-        ).count()
-        return count
-
-    @property
-    def difficulty(self) -> float | None:
-        """
-        average training difficulty
-        @return: float
-        """
-        queryset = Training.objects.filter(  # pylint: disable=no-member
-            training_program_set=self
-        ).aggregate(Avg("difficulty"))
-        return queryset.get("difficulty__avg")
-
     class Meta:  # pylint: disable=too-few-public-methods
         """
         Meta data
@@ -287,41 +326,27 @@ class Training(models.Model):
     Training model
     """
 
+    objects = TrainingQuerySet.as_manager()
+
     name = models.CharField(verbose_name="Название", max_length=64)
     description = models.TextField(verbose_name="Описание")
     difficulty = models.FloatField(
         verbose_name="Сложность",
         validators=[MinValueValidator(1), MaxValueValidator(5)],
     )
+    time = models.DurationField(
+        verbose_name="Время тренировки", null=True, blank=True, editable=False
+    )
+    approach_count = models.PositiveIntegerField(
+        verbose_name="Кол-во упражнений", default=0, editable=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.name}, сложность: {self.difficulty}"
 
-    @property
-    def time(self) -> timedelta | None:
-        """
-        sum of all approach time and rest
-        @return: timedelta
-        """
-        output = Approach.objects.filter(  # pylint: disable=no-member
-            training_id=self.id  # pylint: disable=no-member
-        ).aggregate(time=Sum(ExpressionWrapper(
-            (F("time") + F("rest")) * F("amount"),
-            output_field=models.DurationField()))
-                    )
-        return output.get("time")
-
-    @property
-    def approach_count(self) -> int:
-        """
-        approach amount
-        @return: int
-        """
-        count = Approach.objects.filter(  # pylint: disable=no-member
-            training_id=self.id  # pylint: disable=no-member
-        ).count()
-        return count
-
     class Meta:  # pylint: disable=too-few-public-methods
         """
         Meta data
@@ -340,6 +365,9 @@ class Exercise(models.Model):
     description = models.TextField(verbose_name="Описание")
     image = models.FileField(verbose_name="Изображение", upload_to="images/exercise")
     video = models.FileField(verbose_name="Видео", upload_to="videos/exercise")
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.name}"
@@ -384,10 +412,19 @@ class Approach(models.Model):
         related_query_name="approach_set",
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.exercise}, кол-во повторений: {self.repetition_count}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_training_id = instance.__dict__.get("training_id")
+        return instance
+
     class Meta:  # pylint: disable=too-few-public-methods
         """
         Meta data
@@ -413,6 +450,9 @@ class SportNutrition(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.name}"
@@ -448,6 +488,9 @@ class Portion(models.Model):
         related_name="portions",
         related_query_name="portion_set",
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
 
     def __str__(self):
         return f"{self.name}"
@@ -459,3 +502,26 @@ class Portion(models.Model):
 
         verbose_name = "Порция"
         verbose_name_plural = "Порции"
+
+
+class Tombstone(models.Model):
+    """
+    Deleted catalog entity, used by incremental sync
+    """
+
+    entity = models.CharField(verbose_name="Сущность", max_length=32)
+    object_id = models.BigIntegerField(verbose_name="Id объекта")
+    deleted_at = models.DateTimeField(
+        verbose_name="Дата удаления", auto_now_add=True, db_index=True
+    )
+
+    def __str__(self):
+        return f"{self.entity}, id: {self.object_id}"
+
+    class Meta:  # pylint: disable=too-few-public-methods
+        """
+        Meta data
+        """
+
+        verbose_name = "Удаленный объект"
+        verbose_name_plural = "Удаленные объекты"
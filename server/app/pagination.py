@@ -0,0 +1,20 @@
+"""Import modules that work with pagination"""
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on id, enabled only if client asks for it
+    (passes cursor or page_size), so plain list responses stay the same
+    """
+
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = {self.cursor_query_param, self.page_size_query_param}
+        if not params.intersection(request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -1,7 +1,8 @@
 """Imports that work with permissions"""
-from django.contrib.auth.models import Group
 from rest_framework.permissions import BasePermission
 
+from app.auth import group_names
+
 
 class GroupPermission(BasePermission, type):
     """
@@ -20,19 +21,16 @@ class GroupPermission(BasePermission, type):
         ).__new__(cls, cls.__name__, (), kwargs)
 
     def __init__(cls, groups=None):
-        if groups is not None:
-            cls.groups = Group.objects.filter(name__in=groups)
-        else:
-            cls.groups = []
+        cls.groups = frozenset(groups or ())
         super(GroupPermission, cls).__init__(cls)
 
     def has_permission(  # pylint: disable=bad-mcs-method-argument
         self, request, view
     ) -> bool:
         user = request.user
-        if not any(group in self.groups for group in user.groups.all()):
+        if not user.is_authenticated:
             return False
-        return True
+        return not self.groups.isdisjoint(group_names(user))
 
 
 class UnauthenticatedPost(BasePermission):
@@ -0,0 +1,81 @@
+"""Import modules that work with purchases"""
+from uuid import uuid4
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from app.auth import invalidate_user
+from app.models import Purchase, SportNutrition, Subscriber, TelegramUser, TrainingProgram
+
+
+class PurchaseError(Exception):
+    """
+    Purchase was declined, nothing was charged
+    """
+
+
+class ContentOwned(Exception):
+    """
+    Subscriber already has content, purchase is rolled back
+    """
+
+
+def content_field(content: TrainingProgram | SportNutrition) -> str:
+    """
+    @param content:
+    @return: subscriber and ledger field of content
+    """
+    if isinstance(content, TrainingProgram):
+        return "training_program"
+    return "sport_nutrition"
+
+
+def purchase(
+        user: TelegramUser,
+        content: TrainingProgram | SportNutrition,
+        idempotency_key: str | None = None
+) -> Purchase | None:
+    """
+    Debit content price and assign content to subscriber in one short transaction.
+    Ledger row is inserted first, so a concurrent request with the same key waits
+    on its unique index and is answered with the first purchase. Content is
+    assigned only if subscriber does not have it yet, so concurrent purchases of
+    the same content with different keys are charged once, and balance is
+    debited with a conditional UPDATE instead of a read-modify-write
+    @param user:
+    @param content: training program or sport nutrition
+    @param idempotency_key: repeated key returns the purchase made with it
+    @return: purchase, or None if subscriber already has content
+    """
+    field = content_field(content)
+    key = idempotency_key or uuid4().hex
+    if idempotency_key and (previous := Purchase.objects.filter(
+            telegram_user=user, idempotency_key=key
+    ).first()):
+        return previous
+
+    price = content.price or 0.
+    try:
+        with transaction.atomic():
+            entry = Purchase.objects.create(
+                telegram_user=user, amount=price, idempotency_key=key, **{field: content}
+            )
+            if not Subscriber.objects.filter(telegram_user=user).exclude(
+                    **{field: content}
+            ).update(**{field: content}):
+                if Subscriber.objects.filter(telegram_user=user).exists():
+                    raise ContentOwned("Content is already owned")
+                raise PurchaseError("User is not subscribed")
+            if price > 0. and not TelegramUser.objects.filter(
+                    id=user.id, balance__gte=price
+            ).update(balance=F("balance") - price):
+                raise PurchaseError("Insufficient balance")
+            transaction.on_commit(lambda: invalidate_user(user.telegram_id))
+    except ContentOwned:
+        return None
+    except IntegrityError:
+        previous = Purchase.objects.filter(telegram_user=user, idempotency_key=key).first()
+        if previous is None:
+            raise
+        return previous
+    return entry
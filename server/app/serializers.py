@@ -1,10 +1,11 @@
 """Import modules to work with serializers"""
 from abc import abstractmethod
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import update_last_login
 from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
 from django.db.models import Model
 from rest_framework.serializers import (
     ModelSerializer,
@@ -13,6 +14,8 @@ from rest_framework.serializers import (
     Serializer,
     PrimaryKeyRelatedField
 )
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -25,8 +28,11 @@ from app.models import (
     Portion,
     Exercise,
     TrainingProgramGroup,
-    Approach
+    Approach,
+    Purchase
 )
+from app.blacklist import BlacklistRefreshToken
+from app.purchases import PurchaseError, purchase
 
 
 class InstanceCreationMixin:  # pylint: disable=too-few-public-methods
@@ -384,38 +390,65 @@ class UserUpdateSerializer(UserSerializer):  # pylint: disable=too-many-ancestor
     subscriber = SubscriberUpdateSerializer()
 
     @staticmethod
-    def update_simple(obj: Model, fields: list[str], data: dict):
-        for field in fields:
-            if value := data.get(field):
-                setattr(obj, field, value)
-        obj.save()
+    def update_simple(obj: Model, fields: list[str], data: dict) -> list[str]:
+        """
+        Write only changed fields, skip the query if nothing changed
+        @param obj:
+        @param fields: fields allowed to change
+        @param data: validated data
+        @return: changed fields
+        """
+        changed = [
+            field for field in fields
+            if data.get(field) and getattr(obj, field) != data[field]
+        ]
+        for field in changed:
+            setattr(obj, field, data[field])
+        if changed:
+            obj.save(update_fields=changed)
+        return changed
 
-    def update_business(self, obj: Model, fields: list[str], data: dict):
+    @staticmethod
+    def update_business(instance: TelegramUser, fields: list[str], data: dict) -> list[str]:
+        """
+        Buy content subscriber does not have yet
+        @param instance: user with subscriber
+        @param fields: content fields
+        @param data: validated subscriber data
+        @return: bought content fields
+        """
+        subscriber = instance.subscriber
+        bought = []
         for field in fields:
-            with transaction.atomic():
-                try:
-                    content = data.get(field)
-                    if getattr(obj, field) != content and content is not None:
-                        self.instance.cash -= content.price
-                        setattr(obj, field, content)
-                        self.instance.save()
-                        obj.save()
-                except ValidationError as error:
-                    raise SerializerError(error.message) from error
+            content = data.get(field)
+            if content is None or getattr(subscriber, f"{field}_id") == content.id:
+                continue
+            try:
+                if purchase(instance, content) is not None:
+                    bought.append(field)
+            except PurchaseError as error:
+                raise SerializerError(str(error)) from error
+        if bought:
+            instance.refresh_from_db(fields=["balance"])
+            subscriber.refresh_from_db(fields=bought)
+        return bought
 
     def update(self, instance, validated_data):
-        self.update_simple(instance, ["first_name", "last_name", "balance"], validated_data)
-        if (subscriber_data := validated_data.get("subscriber")) and hasattr(instance, "subscriber"):
-            self.update_simple(
-                instance.subscriber,
-                ["gender", "height", "weight", "age"],
-                subscriber_data
-            )
-            self.update_business(
-                instance.subscriber,
-                ["sport_nutrition", "training_program"],
-                subscriber_data
-            )
+        with transaction.atomic():
+            self.update_simple(instance, ["first_name", "last_name", "balance"], validated_data)
+            subscriber_data = validated_data.get("subscriber")
+            if subscriber_data and hasattr(instance, "subscriber"):
+                self.update_simple(
+                    instance.subscriber,
+                    ["gender", "height", "weight", "age"],
+                    subscriber_data
+                )
+                self.update_business(
+                    instance,
+                    ["sport_nutrition", "training_program"],
+                    subscriber_data
+                )
+        return instance
 
     class Meta:  # pylint: disable=too-few-public-methods
         """Meta class"""
@@ -431,6 +464,32 @@ class UserUpdateSerializer(UserSerializer):  # pylint: disable=too-many-ancestor
         read_only_fields = ("telegram_id",)
 
 
+class PurchaseSerializer(Serializer):  # pylint: disable=abstract-method
+    """
+    Purchase request serializer, exactly one content is bought
+    """
+
+    training_program = PrimaryKeyRelatedField(
+        queryset=TrainingProgram.objects.all(), required=False
+    )
+    sport_nutrition = PrimaryKeyRelatedField(
+        queryset=SportNutrition.objects.all(), required=False
+    )
+    idempotency_key = CharField(
+        max_length=Purchase._meta.get_field("idempotency_key").max_length,  # pylint: disable=protected-access
+        required=False,
+        allow_null=True,
+        validators=[RegexValidator(r"^[\x21-\x7e]+$", "Idempotency key must be printable ASCII")],
+    )
+
+    def validate(self, attrs):
+        content = [field for field in ("training_program", "sport_nutrition") if field in attrs]
+        if len(content) != 1:
+            raise SerializerError("Specify either training_program or sport_nutrition")
+        attrs["content"] = attrs.pop(content[0])
+        return attrs
+
+
 class UserLoginSerializer(Serializer):  # pylint: disable=abstract-method
     """
     User login serializer
@@ -453,3 +512,70 @@ class UserLoginSerializer(Serializer):  # pylint: disable=abstract-method
             }
         except ValidationError as error:
             raise SerializerError(error.message) from error
+
+
+class BlacklistRefreshSerializer(TokenRefreshSerializer):  # pylint: disable=abstract-method
+    """
+    Rejects blacklisted refresh tokens and blacklists rotated ones
+    """
+
+    token_class = BlacklistRefreshToken
+
+
+class SessionSerializer(Serializer):  # pylint: disable=abstract-method
+    """
+    Register-or-login serializer: creates user if it does not exist,
+    otherwise authenticates it, and issues tokens
+    """
+
+    telegram_id = CharField(max_length=32, required=True)
+    chat_id = CharField(required=True, write_only=True, max_length=128)
+    first_name = CharField(max_length=32, required=False, allow_null=True, allow_blank=True)
+    last_name = CharField(max_length=64, required=False, allow_null=True, allow_blank=True)
+
+    def login(self, telegram_id: str, chat_id: str) -> TelegramUser:
+        """
+        @param telegram_id:
+        @param chat_id:
+        @return: user authenticated by TelegramAuthBackend
+        @raise TelegramUser.DoesNotExist: user is not registered
+        """
+        try:
+            return authenticate(self.context["request"], telegram_id=telegram_id, chat_id=chat_id)
+        except ValidationError as error:
+            if isinstance(error.__cause__, TelegramUser.DoesNotExist):  # pylint: disable=no-member
+                raise error.__cause__
+            raise AuthenticationFailed(error.message) from error
+
+    def create(self, validated_data):
+        telegram_id, chat_id = validated_data["telegram_id"], validated_data["chat_id"]
+        names = {
+            field: validated_data[field]
+            for field in ("first_name", "last_name") if validated_data.get(field)
+        }
+        created = False
+        try:
+            user = self.login(telegram_id, chat_id)
+        except TelegramUser.DoesNotExist:  # pylint: disable=no-member
+            try:
+                with transaction.atomic():
+                    user = TelegramUser.objects.create_user(telegram_id, chat_id, **names)
+                created = True
+            except IntegrityError:
+                user = self.login(telegram_id, chat_id)
+
+        if changed := [field for field, value in names.items() if getattr(user, field) != value]:
+            for field in changed:
+                setattr(user, field, names[field])
+            user.save(update_fields=changed)
+
+        refresh = RefreshToken.for_user(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+
+        return {
+            "user": user,
+            "created": created,
+            "refresh": str(refresh),
+            "access": str(refresh.access_token)
+        }
@@ -2,8 +2,11 @@
 import os
 
 from django.conf import settings
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
+from app.caching import invalidate
+
 
 def remove_file(path) -> bool:
     abs_file_path = os.path.join(settings.MEDIA_ROOT, path)
@@ -34,3 +37,143 @@ def delete_media(sender, instance, **kwargs) -> None:  # pylint: disable=unused-
                 remove_file(str(getattr(obj, file)))
             except IsADirectoryError as error:
                 pass
+
+
+def record_tombstone(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    from app.models import Tombstone  # pylint: disable=import-outside-toplevel
+
+    Tombstone.objects.create(entity=sender._meta.model_name, object_id=instance.id)
+
+
+def touch_approach_parents(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Approach changes affect training and program stats"""
+    from app.models import Training, TrainingProgram  # pylint: disable=import-outside-toplevel
+
+    now = timezone.now()
+    training_ids = {instance.training_id, getattr(instance, "loaded_training_id", None)}
+    training_ids.discard(None)
+    Training.objects.filter(id__in=training_ids).refresh_stats(updated_at=now)
+    TrainingProgram.objects.filter(trainings__in=training_ids).refresh_stats(updated_at=now)
+    instance.loaded_training_id = instance.training_id
+    invalidate(Training, TrainingProgram)
+
+
+def remember_training_programs(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Membership rows are deleted before post_delete, so programs are found beforehand"""
+    instance.program_ids = list(instance.training_programs.values_list("id", flat=True))
+
+
+def touch_training_parents(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Training changes affect program stats"""
+    from app.models import Training, TrainingProgram  # pylint: disable=import-outside-toplevel
+
+    now = timezone.now()
+    if kwargs.get("created") is not None:
+        Training.objects.filter(id=instance.id).refresh_stats()
+        programs = TrainingProgram.objects.filter(trainings=instance.id)
+    else:
+        programs = TrainingProgram.objects.filter(id__in=getattr(instance, "program_ids", ()))
+    programs.refresh_stats(updated_at=now)
+    invalidate(Training, TrainingProgram)
+
+
+def touch_program_stats(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Save writes loaded stats back, so they are recomputed after it"""
+    type(instance).objects.filter(id=instance.id).refresh_stats()
+
+
+def touch_exercise_parents(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Exercise is nested into approach representation"""
+    from app.models import Approach  # pylint: disable=import-outside-toplevel
+
+    Approach.objects.filter(exercise=instance.id).update(updated_at=timezone.now())
+
+
+def touch_group_programs(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Group is nested into program representation"""
+    from app.models import TrainingProgram  # pylint: disable=import-outside-toplevel
+
+    TrainingProgram.objects.filter(group=instance.id).update(updated_at=timezone.now())
+
+
+def touch_deleted_program_trainings(
+        sender, instance, **kwargs
+) -> None:  # pylint: disable=unused-argument
+    """Membership rows of deleted program are removed without m2m_changed"""
+    from app.models import Training  # pylint: disable=import-outside-toplevel
+
+    Training.objects.filter(training_program_set=instance.id).update(updated_at=timezone.now())
+    invalidate(Training)
+
+
+def touch_program_trainings(
+        sender, instance, action, reverse, model, pk_set, **kwargs
+) -> None:  # pylint: disable=unused-argument
+    """Program membership is part of both program and training representation"""
+    from app.models import Training, TrainingProgram  # pylint: disable=import-outside-toplevel
+
+    if action == "pre_clear":
+        related = "training_program_set" if not reverse else "trainings"
+        instance.cleared_ids = set(
+            model.objects.filter(**{related: instance.id}).values_list("id", flat=True)
+        )
+    if not action.startswith("post_"):
+        return
+
+    now = timezone.now()
+    related_ids = pk_set if action != "post_clear" else getattr(instance, "cleared_ids", set())
+    program_ids, training_ids = (
+        (related_ids, {instance.id}) if reverse else ({instance.id}, related_ids)
+    )
+    Training.objects.filter(id__in=training_ids).update(updated_at=now)
+    TrainingProgram.objects.filter(id__in=program_ids).refresh_stats(updated_at=now)
+
+
+def invalidate_responses(sender, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Responses cached for previous data of sender are never served again"""
+    invalidate(sender)
+
+
+def invalidate_membership_responses(
+        sender, action, **kwargs
+) -> None:  # pylint: disable=unused-argument
+    """Program membership is part of both program and training representation"""
+    if action.startswith("post_"):
+        from app.models import TrainingProgram, Training  # pylint: disable=import-outside-toplevel
+        invalidate(TrainingProgram, Training)
+
+
+def invalidate_user_snapshot(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Authenticated user snapshot holds both user and subscriber"""
+    from app.auth import invalidate_user  # pylint: disable=import-outside-toplevel
+    from app.models import Subscriber  # pylint: disable=import-outside-toplevel
+
+    user = instance.telegram_user if isinstance(instance, Subscriber) else instance
+    invalidate_user(user.telegram_id)
+
+
+def invalidate_user_groups(
+        sender, instance, action, reverse, pk_set, **kwargs
+) -> None:  # pylint: disable=unused-argument
+    """Group names are cached with user data version"""
+    from app.auth import invalidate_user  # pylint: disable=import-outside-toplevel
+    from app.models import TelegramUser  # pylint: disable=import-outside-toplevel
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        users = [instance.telegram_id]
+    elif action == "pre_clear":
+        users = instance.user_set.values_list("telegram_id", flat=True)
+    else:
+        users = TelegramUser.objects.filter(id__in=pk_set).values_list("telegram_id", flat=True)
+    for telegram_id in users:
+        invalidate_user(telegram_id)
+
+
+def invalidate_group_members(sender, instance, **kwargs) -> None:  # pylint: disable=unused-argument
+    """Renamed or deleted group changes group names of its members"""
+    from app.auth import invalidate_user  # pylint: disable=import-outside-toplevel
+
+    for telegram_id in instance.user_set.values_list("telegram_id", flat=True):
+        invalidate_user(telegram_id)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.models import TelegramUser, Subscriber, TrainingProgram, Training, Exercise, Approach
+
+
+class AdminChangelistQueriesTestCase(TestCase):
+    changelists = ["trainingprogram", "training", "approach", "subscriber"]
+
+    def setUp(self):
+        self.admin = TelegramUser.objects.create_superuser(telegram_id="admin", chat_id="admin")
+        self.client.force_login(self.admin)
+        self.exercise = Exercise.objects.create(name="Name", description="Description")
+
+    def create_rows(self, amount):
+        for _ in range(amount):
+            index = Training.objects.count()
+            training = Training.objects.create(name=f"Name {index}", description="", difficulty=3.)
+            Approach.objects.create(
+                time=timedelta(minutes=1), rest=timedelta(seconds=30),
+                repetition_count=10, amount=2, query_place=0,
+                training=training, exercise=self.exercise
+            )
+            program = TrainingProgram.objects.create(name=f"Name {index}", description="", weeks=4)
+            program.trainings.add(training)
+            user = TelegramUser.objects.create_user(telegram_id=f"user {index}", chat_id="chat")
+            Subscriber.objects.create(telegram_user=user, age=20)
+
+    def count_queries(self, changelist, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(f"admin:app_{changelist}_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        self.create_rows(2)
+        few = {changelist: self.count_queries(changelist) for changelist in self.changelists}
+        self.create_rows(20)
+        many = {changelist: self.count_queries(changelist) for changelist in self.changelists}
+        self.assertEqual(few, many)
+
+    def changelist_column(self, changelist, order, attribute):
+        response = self.client.get(reverse(f"admin:app_{changelist}_changelist"), {"o": order})
+        self.assertEqual(response.status_code, 200)
+        return [getattr(row, attribute) for row in response.context["cl"].result_list]
+
+    def test_sort_by_stats(self):
+        trainings = [
+            Training.objects.create(name=f"Name {index}", description="", difficulty=3.)
+            for index in range(3)
+        ]
+        for training, approaches in zip(trainings, [1, 3, 0]):
+            for place in range(approaches):
+                Approach.objects.create(
+                    time=timedelta(minutes=1), rest=timedelta(seconds=30),
+                    repetition_count=10, amount=2, query_place=place,
+                    training=training, exercise=self.exercise
+                )
+        for index, amount in enumerate([2, 0, 1]):
+            program = TrainingProgram.objects.create(name=f"Name {index}", description="", weeks=4)
+            program.trainings.add(*trainings[:amount])
+        for index, age in enumerate([30, 15, 20]):
+            user = TelegramUser.objects.create_user(telegram_id=f"user {index}", chat_id="chat")
+            Subscriber.objects.create(telegram_user=user, age=age)
+
+        self.assertEqual(self.changelist_column("trainingprogram", "-2", "training_count"), [2, 1, 0])
+        self.assertEqual(self.changelist_column("training", "3", "approach_count"), [0, 1, 3])
+        self.assertEqual(self.changelist_column("subscriber", "3", "age"), [15, 20, 30])
+        self.assertEqual(self.changelist_column("subscriber", "-3", "age"), [30, 20, 15])
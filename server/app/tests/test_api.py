@@ -3,16 +3,23 @@ from datetime import timedelta
 from random import randint
 
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import include, path, reverse
+from django.utils import timezone
+from io import StringIO
 import json
 import itertools
 from rest_framework import status
 from rest_framework.test import APITestCase
-from app.models import Subscriber, TelegramUser, Training, TrainingProgram, Exercise, SportNutrition, Approach, Portion
+from app.models import Subscriber, TelegramUser, Training, TrainingProgram, TrainingProgramGroup, Exercise, SportNutrition, Approach, Portion, Purchase, Tombstone
 
 
 class BaseAPITestCase(APITestCase):
     def setUp(self) -> None:
+        cache.clear()
         self.valid_user = {
             "telegram_id": "string",
             "chat_id": "string",
@@ -85,6 +92,31 @@ class TokenTests(BaseAPITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_refresh_rotated_token(self):
+        token = self.client.post(
+            reverse('token_obtain'),
+            data=json.dumps(dict(itertools.islice(self.valid_user.items(), 2))),
+            content_type='application/json'
+        ).json().get('refresh')
+        rotated = self.client.post(
+            reverse('token_refresh'),
+            data=json.dumps({'refresh': token}),
+            content_type='application/json'
+        )
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse('token_refresh'),
+            data=json.dumps({'refresh': token}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(
+            reverse('token_refresh'),
+            data=json.dumps({'refresh': rotated.json()['refresh']}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_refresh_invalid_token(self):
         response = self.client.post(
             reverse('token_refresh'),
@@ -100,6 +132,47 @@ class TokenTests(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class SessionTests(BaseAPITestCase):
+    def open_session(self, data):
+        return self.client.post(
+            reverse('session'),
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+
+    def test_session_registers_user(self):
+        response = self.open_session(self.valid_user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['created'])
+        self.assertEqual(TelegramUser.objects.count(), 1)
+        self.assertEqual(response.json()['telegram_id'], 'string')
+        self.assertIsNone(response.json()['subscriber'])
+
+        user = self.client.get(
+            reverse('user'),
+            headers={'Authorization': f"Bearer {response.json()['access']}"}
+        )
+        self.assertEqual(user.status_code, status.HTTP_200_OK)
+
+    def test_session_logs_in_user(self):
+        self.open_session(self.valid_user)
+        response = self.open_session({**self.valid_user, 'first_name': 'changed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()['created'])
+        self.assertEqual(response.json()['first_name'], 'changed')
+        self.assertIn('refresh', response.json())
+        self.assertEqual(TelegramUser.objects.count(), 1)
+
+    def test_session_invalid_chat_id(self):
+        self.open_session(self.valid_user)
+        response = self.open_session({**self.valid_user, 'chat_id': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_session_invalid_user(self):
+        response = self.open_session(self.invalid_user)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class UserTests(BaseAPITestCase):
     def setUp(self) -> None:
         super().setUp()
@@ -123,6 +196,19 @@ class UserTests(BaseAPITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_user_cached(self):
+        headers = {'Authorization': "Bearer {token}".format(token=self.token)}
+        self.client.get(reverse('user'), headers=headers)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        user = TelegramUser.objects.get()
+        user.first_name = "Changed"
+        user.save()
+        response = self.client.get(reverse('user'), headers=headers)
+        self.assertEqual(response.json()["first_name"], "Changed")
+
     def test_get_user_invalid_token(self):
         response = self.client.get(
             reverse('user'),
@@ -278,6 +364,38 @@ class SubscriberRegisterMixin:
         return {"Authorization": f"Bearer {token}"}
 
 
+class GroupPermissionTest(BaseAPITestCase, SubscriberRegisterMixin):
+    def setUp(self) -> None:
+        super().setUp()
+        self.headers = self.subscribe_user(self.client, self.valid_user)
+        self.url = reverse('program-list')
+
+    def test_staff_without_group_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue([query for query in context.captured_queries if 'auth_group' in query['sql']])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url + '?page=1', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in context.captured_queries if 'auth_group' in query['sql']])
+
+    def test_removed_from_group(self):
+        self.assertEqual(self.client.get(self.url, headers=self.headers).status_code, status.HTTP_200_OK)
+        Group.objects.get(name="Staff").user_set.clear()
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_renamed_group(self):
+        self.assertEqual(self.client.get(self.url, headers=self.headers).status_code, status.HTTP_200_OK)
+        group = Group.objects.get(name="Staff")
+        group.name = "Former staff"
+        group.save()
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class ApiListTest(BaseAPITestCase, SubscriberRegisterMixin):
     model = None
 
@@ -420,6 +538,70 @@ class SportNutritionListTest(ApiListTest):
         self.assertEqual(len(response.json()), self.model.objects.count())
 
 
+class PortionListTest(ApiListTest):
+    model = Portion
+
+    def get_data(self):
+        return {
+            "name": "Name",
+            "description": "Description",
+            "calories": 100,
+            "proteins": 1,
+            "fats": 1,
+            "carbs": 1,
+            "sport_nutrition": self.nutrition
+        }
+
+    def setUp(self) -> None:
+        self.nutrition = SportNutritionListTest().create_instance()
+        super(PortionListTest, self).setUp("portion-list")
+
+    def test_amount(self):
+        response = self.client.get(
+            self.url,
+            {"nutrition_id": self.nutrition.id},
+            headers=self.headers
+        )
+        self.assertEqual(len(response.json()), self.model.objects.count())
+
+    def test_cursor_pagination(self):
+        ids, url = [], f"{self.url}?page_size=2"
+        while url:
+            response = self.client.get(url, headers=self.headers).json()
+            self.assertLessEqual(len(response["results"]), 2)
+            ids += [portion["id"] for portion in response["results"]]
+            url = response["next"]
+        self.assertEqual(ids, list(self.model.objects.order_by("id").values_list("id", flat=True)))
+
+    async def test_stream(self):
+        response = await self.async_client.get(self.url, {"stream": "true"}, headers=self.headers)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join([part async for part in response.streaming_content]))
+        self.assertEqual(
+            sorted(portion["id"] for portion in data),
+            sorted([pk async for pk in self.model.objects.values_list("id", flat=True)])
+        )
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, headers=self.headers)
+        etag = response["ETag"]
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Portion.objects.first().save()
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    async def test_stream_empty(self):
+        response = await self.async_client.get(
+            self.url, {"stream": "true", "nutrition_id": 0}, headers=self.headers
+        )
+        self.assertEqual(
+            json.loads(b"".join([part async for part in response.streaming_content])), []
+        )
+
+
 class ApiTest(BaseAPITestCase, SubscriberRegisterMixin):
     model = None
 
@@ -475,6 +657,46 @@ class TrainingProgramTest(ApiTest):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_not_modified(self):
+        etag = self.client.get(self.url, headers=self.headers)["ETag"]
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        training = Training.objects.create(name="Name", description="", difficulty=3.)
+        self.instance.trainings.add(training)
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["training_count"], 1)
+
+    def test_group_rename_modifies(self):
+        group = TrainingProgramGroup.objects.create(name="Group")
+        self.instance.group = group
+        self.instance.save()
+        etag = self.client.get(self.url, headers=self.headers)["ETag"]
+
+        group.name = "Renamed"
+        group.save()
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["group"]["name"], "Renamed")
+
+    def test_cached(self):
+        name = self.client.get(self.url, headers=self.headers).json()["name"]
+        TrainingProgram.objects.filter(id=self.program_id).update(name="Changed")
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.json()["name"], name)
+
+        self.instance.refresh_from_db()
+        self.instance.save()
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.json()["name"], "Changed")
+
+    def test_not_found(self):
+        response = self.client.get(
+            reverse('program', args=(self.program_id + 1,)), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class SportNutritionTest(ApiTest):
     nutrition_id = 1
@@ -551,6 +773,16 @@ class TrainingTest(ApiTest):
     def setUp(self) -> None:
         ApiTest.setUp(self, 'training', self.training_id)
 
+    def test_program_delete_modifies(self):
+        program = TrainingProgram.objects.create(name="Name", description="Description", weeks=4)
+        program.trainings.add(self.instance)
+        etag = self.client.get(self.url, headers=self.headers)["ETag"]
+
+        program.delete()
+        response = self.client.get(self.url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["training_programs"], [])
+
     def test_amount(self):
         response = self.client.get(
             self.url,
@@ -558,3 +790,205 @@ class TrainingTest(ApiTest):
             content_type='application/json'
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SyncTest(BaseAPITestCase, SubscriberRegisterMixin):
+    def setUp(self) -> None:
+        super().setUp()
+        self.headers = self.subscribe_user(self.client, self.valid_user)
+        self.url = reverse("sync")
+        self.exercise = Exercise.objects.create(name="Name", description="Description")
+        self.programs = [
+            TrainingProgram.objects.create(name="Name", description="Description", weeks=4)
+            for _ in range(3)
+        ]
+        self.training = Training.objects.create(name="Name", description="", difficulty=3.)
+        self.programs[0].trainings.add(self.training)
+        hour_ago = timezone.now() - timedelta(hours=1)
+        TrainingProgram.objects.update(updated_at=hour_ago)
+        Training.objects.update(updated_at=hour_ago)
+
+    def sync(self, since=None):
+        data = {"since": since} if since else {}
+        response = self.client.get(self.url, data, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_full_sync(self):
+        data = self.sync()
+        self.assertTrue(data["full"])
+        self.assertEqual(len(data["programs"]["upserts"]), 3)
+        self.assertEqual(len(data["trainings"]["upserts"]), 1)
+
+    def test_changes_since_cursor(self):
+        cursor = self.sync()["cursor"]
+        self.assertEqual(self.sync(cursor)["programs"]["upserts"], [])
+
+        self.programs[1].weeks = 8
+        self.programs[1].save()
+        deleted_id = self.programs[2].id
+        self.programs[2].delete()
+        data = self.sync(cursor)
+        self.assertFalse(data["full"])
+        self.assertEqual([program["id"] for program in data["programs"]["upserts"]], [self.programs[1].id])
+        self.assertEqual(data["programs"]["deleted"], [deleted_id])
+        self.assertEqual(data["trainings"], {"upserts": [], "deleted": []})
+
+    def test_recent_changes_are_sent_again(self):
+        self.programs[1].save()
+        cursor = self.sync()["cursor"]
+        data = self.sync(cursor)
+        self.assertEqual([program["id"] for program in data["programs"]["upserts"]], [self.programs[1].id])
+
+    def test_expired_cursor_is_full(self):
+        since = timezone.now() - timedelta(days=31)
+        data = self.sync(since.isoformat().replace("+00:00", "Z"))
+        self.assertTrue(data["full"])
+        self.assertEqual(len(data["programs"]["upserts"]), 3)
+
+    def test_tombstones(self):
+        approach = Approach.objects.create(
+            time=timedelta(minutes=4), rest=timedelta(seconds=30), repetition_count=10,
+            amount=2, query_place=0, training=self.training, exercise=self.exercise
+        )
+        approach.delete()
+        self.programs[2].delete()
+        self.assertEqual(list(Tombstone.objects.values_list("entity", flat=True)), ["trainingprogram"])
+
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        out = StringIO()
+        call_command("prune_tombstones", stdout=out)
+        self.assertIn("Pruned 1", out.getvalue())
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_approach_touches_training_and_program(self):
+        cursor = self.sync()["cursor"]
+        Approach.objects.create(
+            time=timedelta(minutes=4), rest=timedelta(seconds=30), repetition_count=10,
+            amount=2, query_place=0, training=self.training, exercise=self.exercise
+        )
+        data = self.sync(cursor)
+        self.assertEqual([training["id"] for training in data["trainings"]["upserts"]], [self.training.id])
+        self.assertEqual([program["id"] for program in data["programs"]["upserts"]], [self.programs[0].id])
+
+    def test_membership_touches_program(self):
+        cursor = self.sync()["cursor"]
+        self.programs[1].trainings.add(self.training)
+        data = self.sync(cursor)
+        self.assertEqual([program["id"] for program in data["programs"]["upserts"]], [self.programs[1].id])
+        self.assertEqual(len(data["trainings"]["upserts"]), 1)
+
+    def test_group_rename_touches_programs(self):
+        group = TrainingProgramGroup.objects.create(name="Group")
+        self.programs[1].group = group
+        self.programs[1].save()
+        cursor = self.sync()["cursor"]
+        group.name = "Renamed"
+        group.save()
+        data = self.sync(cursor)
+        self.assertEqual([program["id"] for program in data["programs"]["upserts"]], [self.programs[1].id])
+
+    def test_program_delete_touches_trainings(self):
+        cursor = self.sync()["cursor"]
+        self.programs[0].delete()
+        data = self.sync(cursor)
+        self.assertEqual([training["id"] for training in data["trainings"]["upserts"]], [self.training.id])
+        self.assertEqual(data["trainings"]["upserts"][0]["training_programs"], [])
+
+
+class PurchaseTest(BaseAPITestCase, SubscriberRegisterMixin):
+    def setUp(self) -> None:
+        super().setUp()
+        self.headers = self.subscribe_user(self.client, self.valid_user)
+        TelegramUser.objects.update(balance=100.)
+        self.programs = [
+            TrainingProgram.objects.create(name="Name", description="", weeks=4, price=60.)
+            for _ in range(2)
+        ]
+
+    def buy(self, program, key):
+        return self.client.post(
+            reverse('purchase'),
+            data=json.dumps({"training_program": program.id}),
+            headers={**self.headers, "Idempotency-Key": key},
+            content_type='application/json'
+        )
+
+    def test_purchase(self):
+        response = self.buy(self.programs[0], "first")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["balance"], 40.)
+        self.assertEqual(response.json()["subscriber"]["training_program"], self.programs[0].id)
+        self.assertEqual(Purchase.objects.get().amount, 60.)
+
+    def test_repeated_key_is_charged_once(self):
+        self.buy(self.programs[0], "first")
+        response = self.buy(self.programs[0], "first")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(TelegramUser.objects.get().balance, 40.)
+        self.assertEqual(Purchase.objects.count(), 1)
+
+    def test_owned_content_is_charged_once(self):
+        self.buy(self.programs[0], "first")
+        response = self.buy(self.programs[0], "second")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["balance"], 40.)
+        self.assertEqual(Purchase.objects.count(), 1)
+
+    def test_insufficient_balance(self):
+        self.buy(self.programs[0], "first")
+        response = self.buy(self.programs[1], "second")
+        self.assertEqual(response.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+        self.assertEqual(TelegramUser.objects.get().balance, 40.)
+        self.assertEqual(Purchase.objects.count(), 1)
+        self.assertEqual(Subscriber.objects.get().training_program_id, self.programs[0].id)
+
+    def test_invalid_key(self):
+        for key in ("k" * 65, "key with spaces"):
+            response = self.buy(self.programs[0], key)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("idempotency_key", response.json())
+        self.assertEqual(TelegramUser.objects.get().balance, 100.)
+        self.assertEqual(Purchase.objects.count(), 0)
+
+    def test_without_key(self):
+        response = self.client.post(
+            reverse('purchase'),
+            data=json.dumps({"training_program": self.programs[0].id}),
+            headers=self.headers,
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(Purchase.objects.get().idempotency_key), 32)
+
+
+class ProfileUpdateTest(BaseAPITestCase, SubscriberRegisterMixin):
+    def setUp(self) -> None:
+        super().setUp()
+        self.headers = self.subscribe_user(self.client, self.valid_user)
+        self.client.get(reverse('user'), headers=self.headers)
+
+    def update(self, data):
+        return self.client.put(
+            reverse('user'),
+            data=json.dumps(data),
+            headers=self.headers,
+            content_type='application/json'
+        )
+
+    def test_profile_update_queries(self):
+        data = {"first_name": "Name", "subscriber": {"age": 30, "weight": 80}}
+        # savepoint, user update, subscriber update, release
+        with self.assertNumQueries(4):
+            response = self.update(data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        subscriber = Subscriber.objects.get()
+        self.assertEqual((subscriber.age, subscriber.weight), (30, 80))
+        self.assertEqual(TelegramUser.objects.get().first_name, "Name")
+
+    def test_unchanged_profile_is_not_written(self):
+        data = {"first_name": "Name", "subscriber": {"age": 30}}
+        self.update(data)
+        # user reload (previous write dropped cached user), savepoint, release
+        with self.assertNumQueries(3):
+            self.update(data)
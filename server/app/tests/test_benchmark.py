@@ -0,0 +1,204 @@
+import json
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+from statistics import median, quantiles
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+
+
+from app.models import (
+    Approach,
+    Exercise,
+    Portion,
+    SportNutrition,
+    Subscriber,
+    TelegramUser,
+    Training,
+    TrainingProgram,
+)
+from app import urls
+
+# BENCHMARK_SIZES=10,1000,50000 BENCHMARK_REPORT=benchmark.json python manage.py test app.tests.test_benchmark
+SIZES = [int(size) for size in os.environ.get("BENCHMARK_SIZES", "10,50").split(",")]
+REQUESTS = int(os.environ.get("BENCHMARK_REQUESTS", 5))
+REPORT = os.environ.get("BENCHMARK_REPORT")
+
+
+class ApiBenchmark(TestCase):
+    """
+    Seeds catalogs of every size, measures each endpoint and fails
+    if the amount of queries per request grows with catalog size
+    """
+
+    def setUp(self):
+        self.user = {"telegram_id": "benchmark", "chat_id": "benchmark"}
+        user = TelegramUser.objects.create_user(**self.user)
+        Subscriber.objects.create(telegram_user=user)
+        Group.objects.create(name="Staff").user_set.add(user)
+        self.token = self.client.post(
+            reverse("token_obtain"), data=self.user, content_type="application/json"
+        ).json()["access"]
+        self.exercise = Exercise.objects.create(name="Exercise", description="")
+
+    def seed(self, size):
+        start = Training.objects.count()
+        trainings = Training.objects.bulk_create([
+            Training(name=f"Training {index}", description="", difficulty=1 + index % 5)
+            for index in range(start, size)
+        ], batch_size=1000)
+        Approach.objects.bulk_create([
+            Approach(
+                time=timedelta(minutes=1), rest=timedelta(seconds=30), repetition_count=10,
+                amount=1 + index % 3, query_place=0, training=training, exercise=self.exercise
+            )
+            for index, training in enumerate(trainings)
+        ], batch_size=1000)
+        programs = TrainingProgram.objects.bulk_create([
+            TrainingProgram(name=f"Program {index}", description="", weeks=4)
+            for index in range(start, size)
+        ], batch_size=1000)
+        TrainingProgram.trainings.through.objects.bulk_create([
+            TrainingProgram.trainings.through(trainingprogram=program, training=training)
+            for program, training in zip(programs, trainings)
+        ], batch_size=1000)
+        nutritions = SportNutrition.objects.bulk_create([
+            SportNutrition(name=f"Nutrition {index}", description="", dosages="", use="")
+            for index in range(start, size)
+        ], batch_size=1000)
+        Portion.objects.bulk_create([
+            Portion(
+                name="Portion", description="", calories=100, proteins=1, fats=1, carbs=1,
+                sport_nutrition=nutrition
+            )
+            for nutrition in nutritions
+        ], batch_size=1000)
+        Training.objects.refresh_stats()
+        TrainingProgram.objects.refresh_stats()
+
+    def refresh_token(self):
+        return {"refresh": self.client.post(
+            reverse("token_obtain"), data=self.user, content_type="application/json"
+        ).json()["refresh"]}
+
+    def new_user(self):
+        TelegramUser.objects.filter(telegram_id="benchmark-new").delete()
+        return {"telegram_id": "benchmark-new", "chat_id": "benchmark-new"}
+
+    def subscribe(self):
+        Subscriber.objects.filter(telegram_user__telegram_id=self.user["telegram_id"]).delete()
+
+    def unsubscribe(self):
+        user = TelegramUser.objects.get(telegram_id=self.user["telegram_id"])
+        Subscriber.objects.get_or_create(telegram_user=user)
+
+    def purchase(self):
+        user = TelegramUser.objects.get(telegram_id=self.user["telegram_id"])
+        Subscriber.objects.get_or_create(telegram_user=user)
+        Subscriber.objects.filter(telegram_user=user).update(training_program=None)
+        TelegramUser.objects.filter(id=user.id).update(balance=100.)
+        return {"training_program": TrainingProgram.objects.order_by("id").first().id}
+
+    def endpoints(self):
+        """
+        Every route of app.urls except the schema views, data may be
+        a callable which prepares state and returns request data
+        """
+        ids = {
+            model: model.objects.order_by("id").values_list("id", flat=True).first()
+            for model in (TrainingProgram, Training, SportNutrition, Portion, Approach)
+        }
+        return {
+            "POST token_obtain": ("post", reverse("token_obtain"), self.user),
+            "POST token_refresh": ("post", reverse("token_refresh"), self.refresh_token),
+            "POST session": ("post", reverse("session"), {**self.user, "first_name": "Name"}),
+            "POST user": ("post", reverse("user"), self.new_user),
+            "GET user": ("get", reverse("user"), None),
+            "PUT user": ("put", reverse("user"), {"first_name": "Name", "subscriber": {"age": 30}}),
+            "POST subscribe": ("post", reverse("subscribe"), self.subscribe),
+            "DELETE subscribe": ("delete", reverse("subscribe"), self.unsubscribe),
+            "POST purchase": ("post", reverse("purchase"), self.purchase),
+            "GET program": ("get", reverse("program", args=(ids[TrainingProgram],)), None),
+            "GET training": ("get", reverse("training", args=(ids[Training],)), None),
+            "GET nutrition": ("get", reverse("nutrition", args=(ids[SportNutrition],)), None),
+            "GET portion": ("get", reverse("portion", args=(ids[Portion],)), None),
+            "GET approach": ("get", reverse("approach", args=(ids[Approach],)), None),
+            "GET program-list": ("get", reverse("program-list"), None),
+            "GET training-list": ("get", reverse("training-list"), None),
+            "GET nutrition-list": ("get", reverse("nutrition-list"), None),
+            "GET portion-list": ("get", reverse("portion-list"), None),
+            "GET approach-list": ("get", reverse("approach-list"), None),
+            "GET sync": ("get", reverse("sync"), None),
+        }
+
+    def test_every_route_is_measured(self):
+        def names(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from names(pattern.url_patterns)
+                elif pattern.name and not pattern.name.startswith("schema"):
+                    yield pattern.name
+
+        self.seed(1)
+        measured = {name.split()[1] for name in self.endpoints()}
+        self.assertEqual(set(names(urls.urlpatterns)) - measured, set())
+
+    def request(self, method, url, data):
+        cache.clear()
+        headers = {"Authorization": f"Bearer {self.token}"}
+        response = getattr(self.client, method)(
+            url, data=data, headers=headers, content_type="application/json"
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def measure(self, method, url, data):
+        latencies = []
+        for _ in range(REQUESTS):
+            body = data() if callable(data) else data
+            start = time.perf_counter()
+            self.request(method, url, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        body = data() if callable(data) else data
+        with CaptureQueriesContext(connection) as context:
+            response = self.request(method, url, body)
+        # next request resets connection.queries, which captured queries are read from
+        queries = len(context.captured_queries)
+        body = data() if callable(data) else data
+        tracemalloc.start()
+        try:
+            self.request(method, url, body)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "status": response.status_code,
+            "queries": queries,
+            "p50": round(median(latencies), 3),
+            "p99": round(quantiles(latencies, n=100)[-1], 3) if len(latencies) > 1 else None,
+            "peak_memory": peak,
+        }
+
+    def test_endpoints(self):
+        report = {"database": connection.vendor, "requests": REQUESTS, "sizes": {}}
+        for size in sorted(SIZES):
+            self.seed(size)
+            report["sizes"][size] = {
+                name: self.measure(*endpoint) for name, endpoint in self.endpoints().items()
+            }
+        if REPORT:
+            with open(REPORT, "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=2)
+
+        for name in self.endpoints():
+            queries = {size: results[name]["queries"] for size, results in report["sizes"].items()}
+            self.assertEqual(len(set(queries.values())), 1, f"{name} queries grow with N: {queries}")
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from app.filters import DataFilter, duration
+from app.models import Approach, Exercise, Training, TrainingProgram
+
+
+class DataFilterLookupTestCase(SimpleTestCase):
+    def test_numeric_lookups(self):
+        cases = {
+            "<3.5": Q(difficulty__lt=3.5),
+            "<=3.5": Q(difficulty__lte=3.5),
+            "=3.5": Q(difficulty__exact=3.5),
+            ">=3.5": Q(difficulty__gte=3.5),
+            ">3.5": Q(difficulty__gt=3.5),
+        }
+        for string, lookup in cases.items():
+            self.assertEqual(DataFilter.lookup(string, float, "difficulty"), lookup)
+
+    def test_duration_lookup(self):
+        self.assertEqual(
+            DataFilter.lookup(">=1:30", duration, "time"),
+            Q(time__gte=timedelta(minutes=1, seconds=30))
+        )
+
+    def test_string_lookup(self):
+        self.assertEqual(DataFilter.lookup("=twice", str, "use"), Q(use__exact="twice"))
+
+    def test_invalid_expression(self):
+        self.assertEqual(DataFilter.lookup(None, int, "weeks"), Q())
+        self.assertEqual(DataFilter.lookup("8", int, "weeks"), Q())
+        self.assertEqual(DataFilter.lookup(">=", int, "weeks"), Q())
+
+
+class AnnotatedLookupTestCase(TestCase):
+    def setUp(self):
+        exercise = Exercise.objects.create(name="Name", description="Description")
+        self.program = TrainingProgram.objects.create(name="Name", description="", weeks=4)
+        for amount, difficulty in [(1, 2.), (4, 4.)]:
+            training = Training.objects.create(name="Name", description="", difficulty=difficulty)
+            Approach.objects.create(
+                time=timedelta(minutes=1), rest=timedelta(seconds=30),
+                repetition_count=10, amount=amount, query_place=0,
+                training=training, exercise=exercise
+            )
+            self.program.trainings.add(training)
+
+    def test_program_difficulty(self):
+        queryset = TrainingProgram.objects.all()
+        self.assertTrue(queryset.filter(DataFilter.lookup("=3", float, "difficulty")).exists())
+        self.assertFalse(queryset.filter(DataFilter.lookup(">3", float, "difficulty")).exists())
+
+    def test_training_time(self):
+        queryset = Training.objects.filter(
+            DataFilter.lookup(">5:00", duration, "time")
+        )
+        self.assertEqual([training.time for training in queryset], [timedelta(minutes=6)])
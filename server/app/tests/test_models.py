@@ -1,8 +1,17 @@
+import os
 from datetime import timedelta
+from io import StringIO
+from tempfile import TemporaryDirectory
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from app.blacklist import BloomFilter, TokenBlacklist
 from app.models import TelegramUser, Subscriber, TrainingProgram, Training, Exercise, Approach, SportNutrition, Portion, \
-    TrainingProgramGroup
+    TrainingProgramGroup, BlacklistedToken
 
 
 class UserCreationTestCase(TestCase):
@@ -138,3 +147,151 @@ class ModelCreationTestCase(TestCase, metaclass=ModelCreationMetaCase):
             "sport_nutrition_id": 1
         }
     }
+
+
+class TrainingProgramStatsTestCase(TestCase):
+    def setUp(self):
+        exercise = Exercise.objects.create(name="Name", description="Description")
+        self.programs = [
+            TrainingProgram.objects.create(name=f"Name {i}", description="Description", weeks=4)
+            for i in range(3)
+        ]
+        for index, difficulty in enumerate([2., 4.]):
+            training = Training.objects.create(name="Name", description="", difficulty=difficulty)
+            Approach.objects.create(
+                time=timedelta(minutes=4), rest=timedelta(seconds=30),
+                repetition_count=10, amount=index + 1, query_place=0,
+                training=training, exercise=exercise
+            )
+            self.programs[0].trainings.add(training)
+        self.programs[1].trainings.add(training)
+
+    def stats(self):
+        return [
+            (program.id, program.training_count, program.difficulty, program.avg_training_time)
+            for program in TrainingProgram.objects.order_by("id")
+        ]
+
+    def test_stats_single_query(self):
+        with self.assertNumQueries(1):
+            stats = [stat[1:] for stat in self.stats()]
+        self.assertIn((2, 3., timedelta(minutes=4, seconds=30) * 3 / 2), stats)
+        self.assertIn((0, None, None), stats)
+
+    def test_stats_maintained_on_write(self):
+        training = self.programs[0].trainings.get(difficulty=2.)
+        approach = training.approaches.get()
+        approach.amount = 3
+        approach.save()
+        self.programs[0].trainings.remove(self.programs[1].trainings.get())
+        self.programs[2].name = "Changed"
+        self.programs[2].save()
+
+        training.refresh_from_db()
+        self.assertEqual((training.time, training.approach_count), (timedelta(minutes=13, seconds=30), 1))
+        maintained = self.stats()
+        call_command("rebuild_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), maintained)
+        self.assertEqual(maintained[0][1:], (1, 2., timedelta(minutes=13, seconds=30)))
+
+    def test_training_deletion(self):
+        self.programs[1].trainings.get().delete()
+        self.assertEqual(self.stats()[1][1:], (0, None, None))
+        self.assertEqual(self.stats()[0][1:], (1, 2., timedelta(minutes=4, seconds=30)))
+
+
+class CatalogBundleTestCase(TestCase):
+    def setUp(self):
+        group = TrainingProgramGroup.objects.create(name="Group")
+        exercise = Exercise.objects.create(name="Name", description="Description")
+        program = TrainingProgram.objects.create(name="Name", description="", weeks=4, group=group)
+        for index in range(2):
+            training = Training.objects.create(name=f"Name {index}", description="", difficulty=2.)
+            Approach.objects.create(
+                time=timedelta(minutes=1), rest=timedelta(seconds=30),
+                repetition_count=10, amount=index + 1, query_place=0,
+                training=training, exercise=exercise
+            )
+            program.trainings.add(training)
+        nutrition = SportNutrition.objects.create(name="Name", description="", dosages="", use="")
+        Portion.objects.create(
+            name="Name", description="", calories=1, proteins=0, fats=0, carbs=0,
+            sport_nutrition=nutrition
+        )
+
+    def round_trip(self, export_format):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog")
+            call_command("catalog_export", path, format=export_format, stderr=StringIO())
+            call_command("catalog_import", path, format=export_format, stdout=StringIO())
+
+        programs = TrainingProgram.objects.order_by("id")
+        self.assertEqual(programs.count(), 2)
+        original, imported = programs
+        self.assertEqual(imported.group_id, original.group_id + 1)
+        self.assertEqual(
+            (imported.training_count, imported.avg_training_time),
+            (original.training_count, original.avg_training_time)
+        )
+        self.assertEqual(
+            set(imported.trainings.values_list("name", flat=True)),
+            set(original.trainings.values_list("name", flat=True))
+        )
+        self.assertFalse(imported.trainings.filter(id__in=original.trainings.all()).exists())
+        self.assertEqual(
+            Portion.objects.values("sport_nutrition").distinct().count(), 2
+        )
+
+    def test_jsonl(self):
+        self.round_trip("jsonl")
+
+    def test_csv(self):
+        self.round_trip("csv")
+
+    def test_unknown_relation(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.jsonl")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write('{"model": "approach", "id": 1, "training": 5, "exercise": 1}\n')
+            with self.assertRaises(CommandError):
+                call_command("catalog_import", path, stdout=StringIO())
+        self.assertEqual(Approach.objects.count(), 2)
+
+
+class TokenBlacklistTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.blacklist = TokenBlacklist()
+        self.now = timezone.now()
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(100, 0.01)
+        for index in range(100):
+            bloom.add(f"jti-{index}")
+        self.assertTrue(all(f"jti-{index}" in bloom for index in range(100)))
+        false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+        self.assertLess(false_positives, 200)
+
+    def test_not_blacklisted_without_queries(self):
+        BlacklistedToken.objects.create(jti="revoked", expires_at=self.now + timedelta(days=1))
+        self.blacklist.rebuild()
+        with self.assertNumQueries(0):
+            self.assertNotIn("valid", self.blacklist)
+        with self.assertNumQueries(1):
+            self.assertIn("revoked", self.blacklist)
+
+    def test_blacklisted_by_other_worker(self):
+        self.blacklist.rebuild()
+        TokenBlacklist().add("revoked", self.now + timedelta(days=1))
+        with self.assertNumQueries(0):
+            self.assertNotIn("revoked", self.blacklist)
+        self.blacklist.synced_at -= settings.TOKEN_BLACKLIST_SYNC_INTERVAL + 1
+        self.assertIn("revoked", self.blacklist)
+
+    def test_prune(self):
+        BlacklistedToken.objects.create(jti="expired", expires_at=self.now - timedelta(seconds=1))
+        BlacklistedToken.objects.create(jti="revoked", expires_at=self.now + timedelta(days=1))
+        out = StringIO()
+        call_command("prune_blacklist", stdout=out)
+        self.assertIn("Pruned 1", out.getvalue())
+        self.assertEqual(list(BlacklistedToken.objects.values_list("jti", flat=True)), ["revoked"])
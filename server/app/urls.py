@@ -18,7 +18,10 @@ from app.views import (
     NutritionListApi,
     TrainingListApi,
     ApproachListApi,
-    PortionListApi
+    PortionListApi,
+    PurchaseApi,
+    SessionApi,
+    SyncApi
 )
 
 api_routes = [
@@ -29,11 +32,14 @@ api_routes = [
     path("training/<int:training_id>/", TrainingApi.as_view(), name="training"),
     path("approach/<int:approach_id>/", ApproachApi.as_view(), name="approach"),
     path("portion/<int:portion_id>/", PortionApi.as_view(), name="portion"),
-    path("program/list/", ProgramListApi.as_view({'get': 'list'}), name="program-list"),
-    path("nutrition/list/", NutritionListApi.as_view({'get': 'list'}), name="nutrition-list"),
-    path("training/list/", TrainingListApi.as_view({'get': 'list'}), name="training-list"),
-    path("approach/list/", ApproachListApi.as_view({'get': 'list'}), name="approach-list"),
-    path("portion/list/", PortionListApi.as_view({'get': 'list'}), name="portion-list")
+    path("program/list/", ProgramListApi.as_view(), name="program-list"),
+    path("nutrition/list/", NutritionListApi.as_view(), name="nutrition-list"),
+    path("training/list/", TrainingListApi.as_view(), name="training-list"),
+    path("approach/list/", ApproachListApi.as_view(), name="approach-list"),
+    path("portion/list/", PortionListApi.as_view(), name="portion-list"),
+    path("session/", SessionApi.as_view(), name="session"),
+    path("purchase/", PurchaseApi.as_view(), name="purchase"),
+    path("sync/", SyncApi.as_view(), name="sync")
 ]
 
 
@@ -1,7 +1,11 @@
 """Import modules that work with views"""
+from datetime import timedelta
 from typing import Dict
 
-from rest_framework import generics, viewsets
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.serializers import ModelSerializer
 
@@ -9,7 +13,8 @@ from rest_framework.status import (
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
     HTTP_200_OK,
-    HTTP_201_CREATED
+    HTTP_201_CREATED,
+    HTTP_402_PAYMENT_REQUIRED
 )
 from rest_framework.response import Response
 
@@ -19,10 +24,24 @@ from app.filters import (
     TrainingFilterBackend,
     ApproachFilterBackend,
     PortionFilterBackend,
+    SyncFilterBackend,
     duration,
     DataFilter,
 )
-from app.models import TrainingProgram, SportNutrition, Training, Approach, Portion
+from app.models import (
+    TrainingProgram,
+    TrainingProgramGroup,
+    SportNutrition,
+    Training,
+    Approach,
+    Exercise,
+    Portion,
+    Tombstone,
+    TelegramUser
+)
+from app.asynchronous import AsyncListApi, AsyncRetrieveApi
+from app.caching import ResponseCacheMixin
+from app.purchases import PurchaseError, purchase
 from app.permissions import (
     UnauthenticatedPost,
     AuthenticatedPost,
@@ -38,7 +57,9 @@ from app.serializers import (
     NutritionSerializer,
     TrainingSerializer,
     ApproachSerializer,
-    PortionSerializer
+    PortionSerializer,
+    PurchaseSerializer,
+    SessionSerializer
 )
 
 
@@ -146,34 +167,88 @@ class SubscriberApi(generics.GenericAPIView, metaclass=RestApi):
     permission_classes = (SubscribePermission | AuthenticatedPost,)
 
 
-class ProgramApi(generics.GenericAPIView, metaclass=RestApi):
+class SessionApi(generics.GenericAPIView):
+    """
+    Register or login telegram user, answer with tokens,
+    user and subscriber in one response
+    """
+
+    serializer_class = SessionSerializer
+    authentication_classes = ()
+    permission_classes = (UnauthenticatedPost,)
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
+
+        user = TelegramUser.objects.select_related("subscriber").get(id=session.pop("user").id)
+        data = UserSerializer(context=self.get_serializer_context()).to_representation(user)
+        return Response({**data, **session}, status=HTTP_200_OK)
+
+
+class PurchaseApi(generics.GenericAPIView):
+    """
+    Buy training program or sport nutrition, requests repeated
+    with the same Idempotency-Key header are charged once
+    """
+
+    serializer_class = PurchaseSerializer
+    permission_classes = (SubscribePermission,)
+
+    def post(self, request):
+        serializer = self.get_serializer(data={
+            **request.data, "idempotency_key": request.headers.get("Idempotency-Key")
+        })
+        serializer.is_valid(raise_exception=True)
+        try:
+            purchase(
+                request.user,
+                serializer.validated_data["content"],
+                serializer.validated_data.get("idempotency_key")
+            )
+        except PurchaseError as error:
+            return Response({"detail": str(error)}, status=HTTP_402_PAYMENT_REQUIRED)
+
+        user = TelegramUser.objects.select_related("subscriber").get(id=request.user.id)
+        data = UserSerializer(context=self.get_serializer_context()).to_representation(user)
+        return Response(data, status=HTTP_200_OK)
+
+
+class ProgramApi(ResponseCacheMixin, AsyncRetrieveApi):
     """
     Program api
     """
 
-    __methods__ = ["get"]
     serializer_class = ProgramSerializer
     permission_classes = (IsAuthenticated,)
+    queryset = TrainingProgram.objects.select_related("group")
+    cache_models = (TrainingProgram, TrainingProgramGroup, Training, Approach)
+    lookup_url_kwarg = "program_id"
 
 
-class NutritionApi(generics.GenericAPIView, metaclass=RestApi):
+class NutritionApi(ResponseCacheMixin, AsyncRetrieveApi):
     """
     Nutrition api
     """
 
-    __methods__ = ["get"]
     serializer_class = NutritionSerializer
     permission_classes = (IsAuthenticated,)
+    queryset = SportNutrition.objects.all()
+    cache_models = (SportNutrition,)
+    lookup_url_kwarg = "nutrition_id"
 
 
-class TrainingApi(generics.GenericAPIView, metaclass=RestApi):
+class TrainingApi(ResponseCacheMixin, AsyncRetrieveApi):
     """
     Training api
     """
 
-    __methods__ = ["get"]
     serializer_class = TrainingSerializer
     permission_classes = (IsAuthenticated,)
+    queryset = Training.objects.prefetch_related("training_programs")
+    cache_models = (Training, TrainingProgram, Approach)
+    lookup_url_kwarg = "training_id"
 
 
 class ApproachApi(generics.GenericAPIView, metaclass=RestApi):
@@ -186,14 +261,16 @@ class ApproachApi(generics.GenericAPIView, metaclass=RestApi):
     permission_classes = (OwnerPermission,)
 
 
-class PortionApi(generics.GenericAPIView, metaclass=RestApi):
+class PortionApi(ResponseCacheMixin, AsyncRetrieveApi):
     """
     Portion api
     """
 
-    __methods__ = ["get"]
-    serializer_class = ApproachSerializer
+    serializer_class = PortionSerializer
     permission_classes = (IsAuthenticated,)
+    queryset = Portion.objects.all()
+    cache_models = (Portion,)
+    lookup_url_kwarg = "portion_id"
 
 
 """
@@ -201,119 +278,155 @@ Admin APIs - available for staff (only)
 """
 
 
-class ProgramListApi(viewsets.ModelViewSet):
+class ProgramListApi(ResponseCacheMixin, AsyncListApi):
     serializer_class = ProgramSerializer
     filter_backends = (ProgramFilterBackend,)
     permission_classes = (GroupPermission(groups=["Staff"]),)
-    queryset = TrainingProgram.objects.all()
+    queryset = TrainingProgram.objects.select_related("group")
+    cache_models = (TrainingProgram, TrainingProgramGroup, Training, Approach)
 
     def filter_queryset(self, queryset):
-        first_filter = DataFilter.filter(
-            self.request.query_params.get('difficulty'),
-            data_class=float
-        )
-        second_filter = DataFilter.filter(
-            self.request.query_params.get('weeks'),
-            data_class=int
-        )
-
-        queryset = filter(
-            lambda note: first_filter(note.difficulty) and second_filter(note.weeks),
-            TrainingProgram.objects.all()
+        return queryset.filter(
+            DataFilter.lookup(
+                self.request.query_params.get('difficulty'),
+                data_class=float,
+                field="difficulty"
+            ),
+            DataFilter.lookup(
+                self.request.query_params.get('weeks'),
+                data_class=int,
+                field="weeks"
+            )
         )
 
-        return queryset
-
 
-class NutritionListApi(viewsets.ModelViewSet):
+class NutritionListApi(ResponseCacheMixin, AsyncListApi):
     serializer_class = NutritionSerializer
     filter_backends = (NutritionFilterBackend,)
     permission_classes = (GroupPermission(groups=["Staff"]),)
     queryset = SportNutrition.objects.all()
+    cache_models = (SportNutrition,)
 
     def filter_queryset(self, queryset):
-        first_filter = DataFilter.filter(
-            self.request.query_params.get('dosages'),
-            data_class=str
-        )
-        second_filter = DataFilter.filter(
-            self.request.query_params.get('use'),
-            data_class=str
-        )
-        third_filter = DataFilter.filter(
-            self.request.query_params.get('contraindications'),
-            data_class=str
-        )
-
-        queryset = filter(
-            lambda note:
-            first_filter(note.dosages)
-            and second_filter(note.use)
-            and third_filter(note.contraindications),
-            SportNutrition.objects.all()
+        return queryset.filter(
+            *(
+                DataFilter.lookup(
+                    self.request.query_params.get(field),
+                    data_class=str,
+                    field=field
+                )
+                for field in ("dosages", "use", "contraindications")
+            )
         )
 
-        return queryset
-
 
-class TrainingListApi(viewsets.ModelViewSet):
+class TrainingListApi(ResponseCacheMixin, AsyncListApi):
     serializer_class = TrainingSerializer
     filter_backends = (TrainingFilterBackend,)
     permission_classes = (GroupPermission(groups=["Staff"]),)
-    queryset = Training.objects.all()
+    queryset = Training.objects.prefetch_related("training_programs")
+    cache_models = (Training, TrainingProgram, Approach)
 
     def filter_queryset(self, queryset):
         program_id = self.request.query_params.get('program_id')
-        first_filter = DataFilter.filter(
-            self.request.query_params.get('difficulty'),
-            data_class=float
-        )
-        second_filter = DataFilter.filter(
-            self.request.query_params.get('time'),
-            data_class=duration
-        )
-        instances = TrainingProgram.objects.filter(id=program_id)[:1]
-        filter_data = {"training_program_set": instances} if instances else {}
-        queryset = filter(
-            lambda note:
-            first_filter(note.difficulty)
-            and second_filter(note.time),
-            Training.objects.filter(
-                *filter_data
+        if program_id and program_id.isdigit():
+            queryset = queryset.filter(training_program_set=program_id)
+
+        return queryset.filter(
+            DataFilter.lookup(
+                self.request.query_params.get('difficulty'),
+                data_class=float,
+                field="difficulty"
+            ),
+            DataFilter.lookup(
+                self.request.query_params.get('time'),
+                data_class=duration,
+                field="time"
             )
         )
 
-        return queryset
-
 
-class PortionListApi(viewsets.ModelViewSet):
+class PortionListApi(ResponseCacheMixin, AsyncListApi):
     serializer_class = PortionSerializer
     filter_backends = (PortionFilterBackend,)
     permission_classes = (GroupPermission(groups=["Staff"]),)
     queryset = Portion.objects.all()
+    cache_models = (Portion,)
 
     def filter_queryset(self, queryset):
         nutrition_id = self.request.query_params.get('nutrition_id')
-        instance = SportNutrition.objects.filter(id=nutrition_id).first()
-        filter_data = {"training": instance} if instance else {}
-        queryset = Portion.objects.filter(
-            **filter_data
-        )
+        if nutrition_id and nutrition_id.isdigit():
+            queryset = queryset.filter(sport_nutrition=nutrition_id)
         return queryset
 
 
-class ApproachListApi(viewsets.ModelViewSet):
+class ApproachListApi(ResponseCacheMixin, AsyncListApi):
     serializer_class = ApproachSerializer
     filter_backends = (ApproachFilterBackend,)
     permission_classes = (OwnerPermission,)
-    queryset = Approach.objects.all()
+    queryset = Approach.objects.select_related("exercise")
+    cache_models = (Approach, Exercise)
 
     def filter_queryset(self, queryset):
         training_id = self.request.query_params.get('training_id')
-        instance = Training.objects.filter(id=training_id).first()
-        filter_data = {"training": instance} if instance else {}
-        queryset = Approach.objects.filter(
-            **filter_data
-        ).order_by("query_place")
+        if training_id and training_id.isdigit():
+            queryset = queryset.filter(training=training_id)
 
-        return queryset
+        return queryset.order_by("query_place")
+
+
+class SyncApi(generics.GenericAPIView):
+    """
+    Catalog changes (upserts and deletions) since cursor
+    """
+
+    filter_backends = (SyncFilterBackend,)
+    permission_classes = (GroupPermission(groups=["Staff"]),)
+    entities = {
+        "programs": (
+            TrainingProgram.objects.select_related("group"),
+            ProgramSerializer
+        ),
+        "trainings": (
+            Training.objects.prefetch_related("training_programs"),
+            TrainingSerializer
+        ),
+        "nutritions": (SportNutrition.objects.all(), NutritionSerializer),
+        "portions": (Portion.objects.all(), PortionSerializer),
+    }
+
+    @staticmethod
+    def format_cursor(value) -> str:
+        """
+        Cursor is UTC timestamp, which is safe to put into query string
+        @param value: datetime
+        @return: str
+        """
+        return value.isoformat().replace("+00:00", "Z")
+
+    def get(self, request):
+        now = timezone.now()
+        # Rows stamped before now may be committed after this snapshot, so the
+        # cursor lags by SYNC_CURSOR_OVERLAP and clients receive them next time
+        cursor = now - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP)
+        since = parse_datetime(request.query_params.get("since") or "")
+        if since is not None and since < now - timedelta(seconds=settings.SYNC_RETENTION):
+            since = None
+        data = {"cursor": self.format_cursor(cursor), "full": since is None}
+
+        for name, (queryset, serializer_class) in self.entities.items():
+            queryset, deleted = queryset.all(), Tombstone.objects.none()
+            if since is not None:
+                queryset = queryset.filter(updated_at__gte=since)
+                deleted = Tombstone.objects.filter(
+                    entity=queryset.model._meta.model_name,
+                    deleted_at__gte=since
+                )
+            data[name] = {
+                "upserts": serializer_class(
+                    queryset, many=True, context=self.get_serializer_context()
+                ).data,
+                "deleted": list(deleted.values_list("object_id", flat=True))
+            }
+
+        return Response(data, status=HTTP_200_OK)
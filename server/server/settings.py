@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -47,7 +48,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "debug_toolbar",
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_yasg",
@@ -55,7 +55,6 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -65,6 +64,12 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Debug toolbar middleware is sync only, it would make
+# every async view run in a thread, so it is enabled in debug mode only
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(0, "debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "server.urls"
 
 TEMPLATES = [
@@ -100,6 +105,56 @@ DATABASES = {
     }
 }
 
+# "none" opens a connection per request, "persistent" keeps it for
+# db_conn_max_age seconds, "pgbouncer" also disables server-side cursors
+# so the connection can point at pgbouncer in transaction pooling mode.
+# Under ASGI (server.asgi sets SERVER_INTERFACE) sync code runs in a thread
+# per request and connections are thread-local, so persistent connections
+# are never reused: they are closed after every request and pooled by
+# pgbouncer instead. Settings are read from env_file only, so .env.prod has
+# to set db_host=pgbouncer and db_port=5432 for that, otherwise the app
+# connects to postgres directly and opens a connection per request.
+# Without server-side cursors psycopg2 fetches the whole result set, so
+# ?stream=true responses still stream JSON but buffer the rows in memory
+SERVER_INTERFACE = os.environ.get("SERVER_INTERFACE", "wsgi")
+DB_CONNECTION_MODE = config.get(
+    "db_connection_mode", "pgbouncer" if SERVER_INTERFACE == "asgi" else "persistent"
+)
+PERSISTENT_CONNECTIONS = DB_CONNECTION_MODE != "none" and SERVER_INTERFACE != "asgi"
+DATABASES["default"].update({
+    "CONN_MAX_AGE": int(config.get("db_conn_max_age", 60)) if PERSISTENT_CONNECTIONS else 0,
+    "CONN_HEALTH_CHECKS": DB_CONNECTION_MODE != "none",
+    "DISABLE_SERVER_SIDE_CURSORS": DB_CONNECTION_MODE == "pgbouncer",
+})
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# File cache is shared by all workers of one host, so signal invalidation
+# made by one worker is seen by the others; redis_url shares it between hosts
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config.get(
+            "cache_location", os.path.join(tempfile.gettempdir(), "server_cache")
+        ),
+    }
+}
+if config.get("redis_url"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config.get("redis_url"),
+    }
+RESPONSE_CACHE_TIMEOUT = int(config.get("response_cache_timeout", 600))
+AUTH_CACHE_TIMEOUT = int(config.get("auth_cache_timeout", 60))
+TOKEN_BLACKLIST_REBUILD_INTERVAL = int(config.get("token_blacklist_rebuild_interval", 300))
+TOKEN_BLACKLIST_SYNC_INTERVAL = int(config.get("token_blacklist_sync_interval", 5))
+TOKEN_BLACKLIST_PRUNE_INTERVAL = int(config.get("token_blacklist_prune_interval", 3600))
+TOKEN_BLACKLIST_ERROR_RATE = float(config.get("token_blacklist_error_rate", 0.01))
+SYNC_CURSOR_OVERLAP = int(config.get("sync_cursor_overlap", 60))
+SYNC_RETENTION = int(config.get("sync_retention", 30 * 24 * 60 * 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -161,7 +216,7 @@ LOGGING = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.auth.CachedJWTAuthentication',
     ],
 }
 
@@ -191,7 +246,7 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "telegram_id",
 
     "TOKEN_OBTAIN_SERIALIZER": "app.serializers.UserLoginSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "app.serializers.UserLoginSerializer"
+    "TOKEN_REFRESH_SERIALIZER": "app.serializers.BlacklistRefreshSerializer"
 }
 
 
@@ -1,13 +1,18 @@
 import os
 import json
+import mmap
 import asyncio
 import ssl
+import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Callable
 
 import jwt
 
 import aiofiles
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession, TCPConnector
 from aiogram import Bot
 
 from models import (
@@ -26,15 +31,26 @@ from settings import (
     ADMIN_TELEGRAM_ID,
     ADMIN_CHAT_ID,
     CACHE_UPDATE_TIME,
-    BOT_TOKEN
+    BOT_TOKEN,
+    CONNECTION_LIMIT,
+    KEEPALIVE_TIMEOUT,
+    DNS_CACHE_TIME,
+    MEMORY_CACHE_SIZE,
+    MEMORY_CACHE_TTL,
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_REFRESH_INTERVAL,
+    TOKEN_IDLE_TIMEOUT
 )
 
+logger = logging.getLogger(__name__)
+
 program_lock = asyncio.Lock()
 nutrition_lock = asyncio.Lock()
 training_lock = asyncio.Lock()
 portion_lock = asyncio.Lock()
 
 Telegram = Bot(token=BOT_TOKEN)
+SSL_CONTEXT = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH)
 
 
 class IOHandler:
@@ -72,15 +88,157 @@ class IOHandler:
         return await asyncio.gather(*tasks)
 
 
+class SnapshotHandler:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parsed = (None, {})
+
+    @staticmethod
+    def to_bytes(value):
+        return value.encode("utf-8")
+
+    def read_index(self, buffer, stat) -> tuple[dict, int]:
+        header_end = buffer.find(b"\n")
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        parsed_stamp, index = self.parsed
+        if parsed_stamp != stamp:
+            index = json.loads(buffer[:header_end])
+            self.parsed = (stamp, index)
+        return index, header_end + 1
+
+    def read(self, name: str | None = None) -> dict[str, bytes]:
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return {}
+        with open(self.path, "rb") as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            index, start = self.read_index(buffer, os.fstat(file.fileno()))
+            names = index if name is None else [name] if name in index else []
+            return {
+                key: buffer[start + index[key][0]:start + sum(index[key])]
+                for key in names
+            }
+
+    def write(self, records: dict[str, bytes]):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        index, offset = {}, 0
+        for key, record in records.items():
+            index[key] = [offset, len(record)]
+            offset += len(record)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(self.to_bytes(json.dumps(index)) + b"\n")
+            file.writelines(records.values())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def merge(self, upserts: dict[str, str], deleted=(), full: bool = False):
+        records = {} if full else self.read()
+        for key in deleted:
+            records.pop(str(key), None)
+        for key, value in upserts.items():
+            records[str(key)] = self.to_bytes(value)
+        self.write(records)
+
+    async def update(self, upserts: dict[str, str], deleted=(), full: bool = False):
+        await asyncio.to_thread(self.merge, upserts, deleted, full)
+
+    async def get(self, name: str):
+        record = (await asyncio.to_thread(self.read, str(name))).get(str(name))
+        return record.decode() if record is not None else "{}"
+
+    async def get_all(self):
+        return [record.decode() for record in (await asyncio.to_thread(self.read)).values()]
+
+    async def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class MemoryCache:
+
+    def __init__(self, maxsize: int = MEMORY_CACHE_SIZE, ttl: float = MEMORY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.data = OrderedDict()
+
+    def get(self, key: str):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires < time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, version: int = None):
+        if version is not None and version != self.version:
+            return
+        self.data[key] = (value, time.monotonic() + self.ttl)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.version += 1
+        self.data.clear()
+
+
+class TokenStore:
+
+    def __init__(self, idle_timeout: float = TOKEN_IDLE_TIMEOUT):
+        self.tokens = {}
+        self.used = {}
+        self.idle_timeout = idle_timeout
+
+    def get(self, telegram_id) -> Token | None:
+        token = self.tokens.get(str(telegram_id))
+        if token is not None and token.expires > time.time():
+            self.used[str(telegram_id)] = time.monotonic()
+            return token
+        return None
+
+    def set(self, token: Token):
+        if token.payload:
+            telegram_id = str(token.payload.get("telegram_id"))
+            self.tokens[telegram_id] = token
+            self.used.setdefault(telegram_id, time.monotonic())
+
+    def delete(self, telegram_id):
+        self.tokens.pop(str(telegram_id), None)
+        self.used.pop(str(telegram_id), None)
+
+    def evict_idle(self) -> List[str]:
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [telegram_id for telegram_id, used in self.used.items() if used < deadline]
+        for telegram_id in idle:
+            self.delete(telegram_id)
+        return idle
+
+    def expiring(self, margin: float) -> List[Token]:
+        self.evict_idle()
+        deadline = time.time() + margin
+        return [token for token in self.tokens.values() if token.expires <= deadline]
+
+
 class BaseCacheHandler:
 
     files = {}
+    snapshots = {}
     cache_dir = os.path.join(os.path.abspath(""), "cache")
 
     def __init__(self):
         for attr, file in self.files.items():
             path = os.path.join(self.cache_dir, file)
             setattr(self, attr, IOHandler(path))
+        for attr, file in self.snapshots.items():
+            path = os.path.join(self.cache_dir, file)
+            setattr(self, attr, SnapshotHandler(path))
 
 
 def format_data(func: Callable):
@@ -101,11 +259,19 @@ def set_formatter(cls):
 class JsonCacheHandler(BaseCacheHandler):
     files = {
         "users": "users/{file}",
-        "tokens": "tokens/{file}",
-        "programs": "programs/{file}",
-        "nutritions": "nutritions/{file}",
-        "trainings": "trainings/{file}",
-        "portions": "portions/{file}"
+        "tokens": "tokens/{file}"
+    }
+    snapshots = {
+        "programs": "programs.snapshot",
+        "nutritions": "nutritions.snapshot",
+        "trainings": "trainings.snapshot",
+        "portions": "portions.snapshot"
+    }
+    models = {
+        "programs": TrainingProgram,
+        "nutritions": Nutrition,
+        "trainings": Training,
+        "portions": Portion
     }
     ext = "json"
 
@@ -113,6 +279,11 @@ class JsonCacheHandler(BaseCacheHandler):
         super().__init__()
         self.user_lock = asyncio.Lock()
         self.token_lock = asyncio.Lock()
+        self.token_store = TokenStore()
+        self.memory = {
+            name: MemoryCache()
+            for name in ("programs", "nutritions", "trainings", "portions", "approaches")
+        }
 
     @staticmethod
     def to_json(data) -> str:
@@ -126,42 +297,51 @@ class JsonCacheHandler(BaseCacheHandler):
             return json.loads(data)
         return {}
 
+    async def load(self, name: str, model, key: str = None):
+        memory = self.memory[name]
+        version = memory.version
+        cached = memory.get(key or "*")
+        if cached is not None:
+            return cached
+        handler = getattr(self, name)
+        if key:
+            content = self.from_json(await handler.get(key))
+            cached = model(**content) if content else None
+        else:
+            cached = [model(**json.loads(content)) for content in await handler.get_all()]
+        if cached is not None:
+            memory.set(key or "*", cached, version)
+        return cached
+
     async def get_programs(self, data: dict, _id: str) -> List[TrainingProgram]:
         if data.get(_id):
-            program = self.from_json(await self.programs.get(f"{data[_id]}.{self.ext}"))
-            return TrainingProgram(**program) if program else None
+            return await self.load("programs", TrainingProgram, str(data[_id]))
 
-        programs = [json.loads(content) for content in await self.programs.get_all()]
-        instances = [TrainingProgram(**program) for program in programs]
+        instances = await self.load("programs", TrainingProgram)
 
         return [instance for instance in instances if instance.filter(data)]
 
     async def get_nutritions(self, data: dict, _id: str) -> List[Nutrition]:
         if data.get(_id):
-            nutrition = self.from_json(await self.nutritions.get(f"{data[_id]}.{self.ext}"))
-            return Nutrition(**nutrition) if nutrition else None
+            return await self.load("nutritions", Nutrition, str(data[_id]))
 
-        nutritions = [json.loads(content) for content in await self.nutritions.get_all()]
+        instances = await self.load("nutritions", Nutrition)
 
-        return [Nutrition(**nutrition) for nutrition in nutritions] if nutritions else None
+        return list(instances) if instances else None
 
     async def get_trainings(self, data: dict, _id: str) -> List[Training]:
         if data.get(_id):
-            training = self.from_json(await self.trainings.get(f"{data[_id]}.{self.ext}"))
-            return Training(**training) if training else None
+            return await self.load("trainings", Training, str(data[_id]))
 
-        trainings = [json.loads(content) for content in await self.trainings.get_all()]
-        instances = [Training(**training) for training in trainings]
+        instances = await self.load("trainings", Training)
 
         return [instance for instance in instances if instance.filter(data)]
 
     async def get_portions(self, data: dict, _id: str) -> List[Portion]:
         if data.get(_id):
-            portion = self.from_json(await self.portions.get(f"{data[_id]}.{self.ext}"))
-            return Portion(**portion) if portion else None
+            return await self.load("portions", Portion, str(data[_id]))
 
-        portions = [json.loads(content) for content in await self.portions.get_all()]
-        instances = [Portion(**portion) for portion in portions]
+        instances = await self.load("portions", Portion)
 
         return [instance for instance in instances if instance.filter(data)]
 
@@ -174,46 +354,72 @@ class JsonCacheHandler(BaseCacheHandler):
             return TelegramUser(**user)
 
     async def get_token(self, data: dict, _id: str) -> Token:
+        if token := self.token_store.get(data.get(_id)):
+            return token
         async with self.token_lock:
             token = self.from_json(await self.tokens.get(
                 f"{data.get(_id)}.{self.ext}"
             ))
         if token:
-            return Token(**token)
+            token = Token(**token)
+            self.token_store.set(token)
+            return token
 
     async def update_programs(self, formatted_data: dict, _id: str):
         async with program_lock:
-            tasks = []
-            for data in formatted_data:
-                tasks.append(self.programs.post(json.dumps(data), f"{data.get(_id)}.{self.ext}"))
-            await asyncio.gather(*tasks)
+            await self.programs.update(
+                {data.get(_id): json.dumps(data) for data in formatted_data}
+            )
+            self.memory["programs"].clear()
 
     async def update_nutritions(self, formatted_data: dict, _id: str):
         async with nutrition_lock:
-            tasks = []
-            for data in formatted_data:
-                tasks.append(self.nutritions.post(json.dumps(data), f"{data.get(_id)}.{self.ext}"))
-            await asyncio.gather(*tasks)
+            await self.nutritions.update(
+                {data.get(_id): json.dumps(data) for data in formatted_data}
+            )
+            self.memory["nutritions"].clear()
 
     async def update_trainings(self, formatted_data: dict, _id: str):
         async with training_lock:
-            tasks = []
-            for data in formatted_data:
-                tasks.append(self.trainings.post(json.dumps(data), f"{data.get(_id)}.{self.ext}"))
-            await asyncio.gather(*tasks)
+            await self.trainings.update(
+                {data.get(_id): json.dumps(data) for data in formatted_data}
+            )
+            self.memory["trainings"].clear()
+            self.memory["approaches"].clear()
 
     async def update_portions(self, formatted_data: dict, _id: str):
         async with portion_lock:
-            tasks = []
-            for data in formatted_data:
-                tasks.append(self.portions.post(json.dumps(data), f"{data.get(_id)}.{self.ext}"))
-            await asyncio.gather(*tasks)
+            await self.portions.update(
+                {data.get(_id): json.dumps(data) for data in formatted_data}
+            )
+            self.memory["portions"].clear()
+
+    async def apply_sync(self, data: dict, _id: str):
+        entities = {
+            "programs": (self.programs, program_lock),
+            "nutritions": (self.nutritions, nutrition_lock),
+            "trainings": (self.trainings, training_lock),
+            "portions": (self.portions, portion_lock)
+        }
+        for name, (handler, lock) in entities.items():
+            delta = data.get(name, {})
+            async with lock:
+                await handler.update(
+                    {item.get(_id): json.dumps(item) for item in delta.get("upserts", [])},
+                    delta.get("deleted", []),
+                    bool(data.get("full"))
+                )
+                self.memory[name].clear()
+        trainings = data.get("trainings", {})
+        if data.get("full") or trainings.get("upserts") or trainings.get("deleted"):
+            self.memory["approaches"].clear()
 
     async def update_token(self, formatted_data: dict, _id: str) -> None:
         payload = jwt.decode(
             formatted_data.get("access"),
             SECRET_KEY, algorithms=["HS256"]
         )
+        self.token_store.set(Token(**formatted_data))
         async with self.token_lock:
             await self.tokens.post(self.to_json(formatted_data), f"{payload.get(_id)}.{self.ext}")
 
@@ -239,16 +445,21 @@ class JsonCacheHandler(BaseCacheHandler):
                 f"{formatted_data.get(_id)}.{self.ext}"
             )
 
-
-async def auth_user(client, registered_user: TelegramUser) -> TelegramUser:
-    asyncio.create_task(client.get_token(registered_user))
-    return registered_user
+    async def update_session(self, formatted_data: dict, _id: str) -> None:
+        token = {field: formatted_data.pop(field) for field in ("access", "refresh")}
+        formatted_data.pop("created", None)
+        await self.update_token(self.to_json(token), _id)
+        async with self.user_lock:
+            await self.users.post(
+                self.to_json(formatted_data),
+                f"{formatted_data.get(_id)}.{self.ext}"
+            )
 
 
 async def register_user(client, anonymous_user: TelegramUser) -> TelegramUser:
-    telegram_user = await client.create_user(anonymous_user)
-    if isinstance(telegram_user, TelegramUser):
-        return await auth_user(client, telegram_user)
+    telegram_user = await client.open_session(anonymous_user)
+    if isinstance(telegram_user, TelegramUser) and telegram_user.created:
+        return telegram_user
 
 
 def create_anonymous_user(data) -> TelegramUser:
@@ -267,12 +478,11 @@ def create_admin_user() -> TelegramUser:
 
 
 async def get_programs(data: dict = None) -> List[TrainingProgram] | List:
-    client = ApiClient()
     instance: TelegramUser = create_admin_user()
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        instances: list[TrainingProgram] = await client.get_programs(
+        instances: list[TrainingProgram] = await api_client.get_programs(
             instance, token,
             cache=True, data=data
         )
@@ -281,12 +491,11 @@ async def get_programs(data: dict = None) -> List[TrainingProgram] | List:
 
 
 async def get_program(message, data: dict = None) -> TrainingProgram | None:
-    client = ApiClient()
     instance: TelegramUser = create_anonymous_user(data=message)
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        program: TrainingProgram = await client.get_program(
+        program: TrainingProgram = await api_client.get_program(
             instance, token,
             cache=True,
             data=data
@@ -295,27 +504,25 @@ async def get_program(message, data: dict = None) -> TrainingProgram | None:
     return None
 
 
-async def get_approaches(message, data) -> List[Approach]:
-    client = ApiClient()
+async def get_approaches(message, data, cache: bool = True) -> List[Approach]:
     instance: TelegramUser = create_anonymous_user(message)
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        instances: list[TrainingProgram] = await client.get_approaches(
+        instances: list[TrainingProgram] = await api_client.get_approaches(
             instance, token,
-            cache=True, data=data
+            cache=cache, data=data
         )
         return instances
     return []
 
 
 async def get_nutritions(data: dict = None) -> List[Nutrition] | List:
-    client = ApiClient()
     instance: TelegramUser = create_admin_user()
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        instances: List[Nutrition] = await client.get_nutritions(
+        instances: List[Nutrition] = await api_client.get_nutritions(
             instance, token,
             cache=True, data=data
         )
@@ -324,12 +531,11 @@ async def get_nutritions(data: dict = None) -> List[Nutrition] | List:
 
 
 async def get_nutrition(message, data: dict = None) -> Nutrition | None:
-    client = ApiClient()
     instance: TelegramUser = create_anonymous_user(data=message)
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        nutrition: Nutrition = await client.get_nutrition(
+        nutrition: Nutrition = await api_client.get_nutrition(
             instance, token,
             cache=True,
             data=data
@@ -339,12 +545,11 @@ async def get_nutrition(message, data: dict = None) -> Nutrition | None:
 
 
 async def get_trainings(data: dict = None) -> List[Training] | List:
-    client = ApiClient()
     instance: TelegramUser = create_admin_user()
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        instances: List[Training] = await client.get_trainings(
+        instances: List[Training] = await api_client.get_trainings(
             instance, token,
             cache=True, data=data
         )
@@ -353,12 +558,11 @@ async def get_trainings(data: dict = None) -> List[Training] | List:
 
 
 async def get_portions(data: dict = None) -> List[Portion] | List:
-    client = ApiClient()
     instance: TelegramUser = create_admin_user()
 
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        instances: List[Portion] = await client.get_portions(
+        instances: List[Portion] = await api_client.get_portions(
             instance, token,
             cache=True, data=data
         )
@@ -366,12 +570,16 @@ async def get_portions(data: dict = None) -> List[Portion] | List:
     return []
 
 
+async def get_cached(name: str, _id) -> TrainingProgram | Nutrition | Training | Portion | None:
+    handler: JsonCacheHandler = api_client.handler
+    return await handler.load(name, handler.models[name], str(_id))
+
+
 async def update_subscribe(message, data: dict) -> bool | None:
-    client = ApiClient()
     instance: TelegramUser = create_anonymous_user(message)
-    token: Token = await client.get_token(instance)
+    token: Token = await api_client.get_token(instance)
     if isinstance(token, Token):
-        user = await client.update_user(
+        user = await api_client.update_user(
             instance, token,
             data={"subscriber": data}
         )
@@ -379,14 +587,48 @@ async def update_subscribe(message, data: dict) -> bool | None:
     return None
 
 
+async def purchase_content(message, data: dict, key: str) -> bool | None:
+    instance: TelegramUser = create_anonymous_user(message)
+    token: Token = await api_client.get_token(instance)
+    if isinstance(token, Token):
+        user = await api_client.purchase(
+            instance, token,
+            data={field: value for field, value in data.items() if value is not None},
+            key=key
+        )
+        return isinstance(user, TelegramUser)
+    return None
+
+
 class ApiClient:
 
     cache_class = JsonCacheHandler
+    etags = {}
+    session: ClientSession | None = None
 
     def __init__(self):
         self.handler = self.cache_class()
         self.base_url = HOST
 
+    @classmethod
+    def get_session(cls) -> ClientSession:
+        if cls.session is None or cls.session.closed:
+            cls.session = ClientSession(
+                connector=TCPConnector(
+                    ssl=SSL_CONTEXT,
+                    limit=CONNECTION_LIMIT,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=DNS_CACHE_TIME
+                )
+            )
+        return cls.session
+
+    @classmethod
+    async def close(cls):
+        if cls.session is not None and not cls.session.closed:
+            await cls.session.close()
+        cls.session = None
+
     @staticmethod
     def get_headers(data: dict = None):
         headers = {
@@ -405,27 +647,34 @@ class ApiClient:
             url += f"?{params}"
         return url
 
+    def to_model(self, model, content: str):
+        output = self.handler.from_json(content)
+        if isinstance(output, list):
+            return [model(**data) for data in output]
+        return model(**output)
+
     async def send_request(
             self,
             url, headers, method, status,
             model, _id_field, cache_function=None,
             **data
     ):
-        sslcontext = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH)
-        async with ClientSession(headers=headers) as session:
-            request = getattr(session, method)
-            response = await request(url, ssl=sslcontext, **data)
-
+        etag, cached_content = self.etags.get(url, (None, None)) if method == "get" else (None, None)
+        if etag is not None:
+            headers = {**headers, "If-None-Match": etag}
+        request = getattr(self.get_session(), method)
+        async with request(url, headers=headers, **data) as response:
+            if response.status == 304 and cached_content is not None:
+                return self.to_model(model, cached_content)
             content = (await response.read()).decode()
             if response.status == status:
+                if method == "get" and (new_etag := response.headers.get("ETag")):
+                    self.etags[url] = (new_etag, content)
                 if cache_function is not None:
                     asyncio.create_task(
                         cache_function(content, _id_field)
                     )
-                output = self.handler.from_json(content)
-                if isinstance(output, list):
-                    return [model(**data) for data in output]
-                return model(**output)
+                return self.to_model(model, content)
         return self.handler.from_json(content)
 
     @staticmethod
@@ -458,41 +707,41 @@ class ApiClient:
                 for file in os.listdir(path):
                     if os.path.exists(os.path.join(path, file)):
                         os.remove(os.path.join(path, file))
+        for value in self.handler.snapshots:
+            await getattr(self.handler, value).clear()
+        for memory in self.handler.memory.values():
+            memory.clear()
 
-    async def update_program_cache(self, admin: TelegramUser):
-        while True:
-            token: Token = await self.get_token(admin)
-            if isinstance(token, Token):
-                await self.get_programs(admin, token, data=None, cache=False)
-            await asyncio.sleep(CACHE_UPDATE_TIME)
-
-    async def update_nutrition_cache(self, admin: TelegramUser):
+    async def sync_cache(self, admin: TelegramUser):
+        cursor = None
         while True:
-            token: Token = await self.get_token(admin)
-            if isinstance(token, Token):
-                await self.get_nutritions(admin, token, data=None, cache=False)
-            await asyncio.sleep(CACHE_UPDATE_TIME)
-
-    async def update_training_cache(self, admin: TelegramUser):
-        while True:
-            token: Token = await self.get_token(admin)
-            if isinstance(token, Token):
-                await self.get_trainings(admin, token, data=None, cache=False)
-            await asyncio.sleep(CACHE_UPDATE_TIME)
-
-    async def update_portion_cache(self, admin: TelegramUser):
-        while True:
-            token: Token = await self.get_token(admin)
-            if isinstance(token, Token):
-                await self.get_portions(admin, token, data=None, cache=False)
+            try:
+                token: Token = await self.get_token(admin)
+                if isinstance(token, Token):
+                    data = await self.sync(
+                        admin, token, data={"since": cursor} if cursor else None
+                    )
+                    if isinstance(data, dict) and data.get("cursor"):
+                        await self.handler.apply_sync(data, "id")
+                        cursor = data["cursor"]
+            except (ClientError, asyncio.TimeoutError, ValueError) as error:
+                logger.warning("Cache sync failed: %r", error)
             await asyncio.sleep(CACHE_UPDATE_TIME)
 
     async def update_cache(self, dispatcher):
         instance: TelegramUser = create_admin_user()
-        asyncio.create_task(self.update_program_cache(instance))
-        asyncio.create_task(self.update_nutrition_cache(instance))
-        asyncio.create_task(self.update_training_cache(instance))
-        asyncio.create_task(self.update_portion_cache(instance))
+        asyncio.create_task(self.sync_cache(instance))
+
+    async def refresh_tokens(self):
+        store = self.handler.token_store
+        while True:
+            try:
+                for token in store.expiring(TOKEN_REFRESH_MARGIN):
+                    if not isinstance(await self.refresh_token(token), Token):
+                        await self.get_token(TelegramUser(**token.post_data()), False)
+            except (ClientError, asyncio.TimeoutError, ValueError) as error:
+                logger.warning("Token refresh failed: %r", error)
+            await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
 
     async def get_token(self, user: TelegramUser, cache=True):
         url = f"{self.base_url}/api/token/"
@@ -514,6 +763,34 @@ class ApiClient:
             data=json.dumps(user.access_data())
         )
 
+    async def refresh_token(self, token: Token):
+        url = f"{self.base_url}/api/token/refresh/"
+        headers = self.get_headers()
+        return await self.send_request(
+            url,
+            headers,
+            "post",
+            200,
+            Token,
+            "telegram_id",
+            self.handler.update_token,
+            data=json.dumps(token.refresh_data())
+        )
+
+    async def open_session(self, user: TelegramUser) -> TelegramUser:
+        url = f"{self.base_url}/api/session/"
+        headers = self.get_headers()
+        return await self.send_request(
+            url,
+            headers,
+            "post",
+            200,
+            TelegramUser,
+            "telegram_id",
+            self.handler.update_session,
+            data=json.dumps(user.post_data())
+        )
+
     async def create_user(self, user: TelegramUser) -> TelegramUser:
         url = f"{self.base_url}/api/user/"
         headers = self.get_headers()
@@ -597,6 +874,7 @@ class ApiClient:
             )
             if nutritions is not None:
                 return nutritions
+        url = self.set_query_data(url, kwargs.get("data"))
         headers = self.get_headers(token.access_data())
         return await self.send_request(
             url,
@@ -677,8 +955,12 @@ class ApiClient:
                 [f"{key}={value}" for key, value in kwargs["data"].items()]
             )
             url += f"?{params}"
+        memory = self.handler.memory["approaches"]
+        version = memory.version
+        if kwargs.get("cache") and (cached := memory.get(url)) is not None:
+            return cached
         headers = self.get_headers(token.access_data())
-        return await self.send_request(
+        instances = await self.send_request(
             url,
             headers,
             "get",
@@ -686,6 +968,22 @@ class ApiClient:
             Approach,
             "id"
         )
+        if isinstance(instances, list):
+            memory.set(url, instances, version)
+        return instances
+
+    @check_token
+    async def sync(self, user: TelegramUser, token: Token, **kwargs) -> dict:
+        url = self.set_query_data(f"{self.base_url}/api/sync/", kwargs.get("data"))
+        headers = self.get_headers(token.access_data())
+        return await self.send_request(
+            url,
+            headers,
+            "get",
+            200,
+            dict,
+            "id"
+        )
 
     @check_token
     async def create_subscriber(self, user: TelegramUser, token: Token, **kwargs) -> Subscriber:
@@ -716,3 +1014,21 @@ class ApiClient:
             self.handler.update_user,
             data=json.dumps(kwargs.get("data", {}))
         )
+
+    @check_token
+    async def purchase(self, user: TelegramUser, token: Token, **kwargs) -> TelegramUser:
+        url = f"{self.base_url}/api/purchase/"
+        headers = self.get_headers({**token.access_data(), "Idempotency-Key": kwargs.get("key")})
+        return await self.send_request(
+            url,
+            headers,
+            "post",
+            200,
+            TelegramUser,
+            "telegram_id",
+            self.handler.update_user,
+            data=json.dumps(kwargs.get("data", {}))
+        )
+
+
+api_client = ApiClient()
@@ -4,7 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.filters import text, command
 
-from api import ApiClient, Telegram
+from api import ApiClient, Telegram, api_client
 
 from handlers import (
     start,
@@ -23,7 +23,8 @@ from handlers import (
     disable_schedule
 )
 from middlewares import RegisterMiddleware, SubscribeMiddleware
-from notifications import scheduler
+from notifications import notifier
+from settings import REDIS_URL
 from states import (
     ProgramState,
     get_program_filter,
@@ -66,7 +67,11 @@ from keyboards import (
 
 from aiogram import Dispatcher, types, Router
 
-storage = MemoryStorage()
+if REDIS_URL:
+    from aiogram.fsm.storage.redis import RedisStorage
+    storage = RedisStorage.from_url(REDIS_URL)
+else:
+    storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
 register_router = Router()
@@ -217,12 +222,18 @@ dp.callback_query.register(
 
 
 async def main():
-    scheduler.start()
-    client = ApiClient()
-
-    await client.update_cache(dp)
-    await dp.start_polling(Telegram)
-    await client.clear_cache(dp)
+    await notifier.start()
+
+    await api_client.update_cache(dp)
+    refresher = asyncio.create_task(api_client.refresh_tokens())
+    try:
+        await dp.start_polling(Telegram)
+    finally:
+        refresher.cancel()
+        notifier.stop()
+        await api_client.clear_cache(dp)
+        await ApiClient.close()
+        await storage.close()
 
 
 if __name__ == '__main__':
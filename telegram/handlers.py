@@ -4,11 +4,11 @@ from aiogram.fsm.context import FSMContext
 from api import (
     Telegram,
     ApiClient,
+    api_client,
     create_anonymous_user,
     register_user,
-    update_subscribe,
+    purchase_content,
     get_program,
-    get_approaches,
     get_trainings,
     get_nutritions,
     get_programs
@@ -26,7 +26,7 @@ from keyboards import (
     Schedule,
     Content,
 )
-from notifications import scheduler
+from notifications import notifier
 from states import (
     ProgramState,
     NutritionState,
@@ -36,7 +36,9 @@ from states import (
     CaloriesState,
     InfoState,
     Cycle,
-    Iterable
+    Iterable,
+    get_next_instance,
+    load_approaches
 )
 from models import (
     TelegramUser,
@@ -47,10 +49,9 @@ from models import (
 
 async def start(message: types.Message, state: FSMContext):
     await state.clear()
-    client = ApiClient()
     instance: TelegramUser = create_anonymous_user(message.from_user)
 
-    user: TelegramUser = await register_user(client, instance)
+    user: TelegramUser = await register_user(api_client, instance)
     if user:
         msg: str = f"Привет {user.first_name} {user.last_name} 👋️\n\n" \
                    "Я <b>спорт-бот</b>, и я помогу тебе подобрать " \
@@ -91,14 +92,14 @@ async def subscribe(message: types.Message, state: FSMContext, client: ApiClient
 async def programs(message: types.Message, state: FSMContext):
     await state.clear()
     try:
-        instances = iter(Cycle(await get_programs()))
-        instance = instances.__next__()
+        await state.update_data({"programs": Cycle.of(await get_programs()).dump()})
+        instance = await get_next_instance("programs", state)
         await Telegram.send_message(
             message.from_user.id,
             instance.message, parse_mode="HTML",
             reply_markup=create_content_keyboard(instance, training_program=instance.id)
         )
-        await state.update_data({"programs": instances, "id": instance.id})
+        await state.update_data({"id": instance.id})
         await state.set_state(ProgramState.next_program)
     except ValueError:
         await message.reply("Контента нет")
@@ -106,17 +107,20 @@ async def programs(message: types.Message, state: FSMContext):
 
 async def nutritions(message: types.Message, state: FSMContext):
     await state.clear()
-    instances = iter(Cycle(await get_nutritions()))
-    nutrition = instances.__next__()
+    try:
+        await state.update_data({"nutritions": Cycle.of(await get_nutritions()).dump()})
+        nutrition = await get_next_instance("nutritions", state)
 
-    await Telegram.send_message(
-        message.from_user.id,
-        nutrition.message, parse_mode="HTML",
-        reply_markup=create_content_keyboard(nutrition)
-    )
+        await Telegram.send_message(
+            message.from_user.id,
+            nutrition.message, parse_mode="HTML",
+            reply_markup=create_content_keyboard(nutrition)
+        )
 
-    await state.update_data({"nutritions": instances, "id": nutrition.id})
-    await state.set_state(NutritionState.next_nutrition)
+        await state.update_data({"id": nutrition.id})
+        await state.set_state(NutritionState.next_nutrition)
+    except ValueError:
+        await message.reply("Контента нет")
 
 
 async def my_health(message: types.Message, state: FSMContext, subscriber: Subscriber):
@@ -125,7 +129,7 @@ async def my_health(message: types.Message, state: FSMContext, subscriber: Subsc
         subscriber.message,
         parse_mode="HTML",
         reply_markup=create_my_health_keyboard(
-            scheduler.get_job(str(message.from_user.id)) is None,
+            not notifier.has(message.from_user.id),
             id=subscriber.training_program
         )
     )
@@ -163,7 +167,7 @@ async def buy_content(call: types.CallbackQuery, callback_data: Content, state:
         "training_program": callback_data.training_program,
         "sport_nutrition": callback_data.sport_nutrition
     }
-    if await update_subscribe(call.from_user, data):
+    if await purchase_content(call.from_user, data, call.id):
         await call.message.edit_text("Вы успешно приобрели продукт!")
     else:
         await call.message.edit_text("Продукт не был приобретен. Проверьте баланс или обратитесь в тех. поддержку.")
@@ -196,8 +200,8 @@ async def schedule(call: types.CallbackQuery, state: FSMContext):
 
 async def disable_schedule(call: types.CallbackQuery, state: FSMContext):
     await state.clear()
-    if scheduler.get_job(str(call.from_user.id)):
-        scheduler.remove_job(str(call.from_user.id))
+    if notifier.has(call.from_user.id):
+        await notifier.remove(call.from_user.id)
     await Telegram.send_message(
         call.from_user.id, "Уведомление успешно отменено!"
     )
@@ -206,22 +210,21 @@ async def disable_schedule(call: types.CallbackQuery, state: FSMContext):
 async def approaches(message: types.Message, state: FSMContext, subscriber: Subscriber):
     await state.clear()
     if program_id := subscriber.training_program:
-        trainings = iter(Iterable([
-            training.id for training in
-            await get_trainings({"program_id": program_id})
-        ]))
-        instances = iter(
-            Cycle(await get_approaches(
-                message.from_user, {"training_id": next(trainings)}
-            ))
-        )
-        if trainings.loop and instances.loop:
-            approach = next(instances)
+        trainings = Iterable.of(await get_trainings({"program_id": program_id}))
+        training_id = next(trainings, None)
+        instances = await load_approaches(message.from_user, training_id) if training_id else {}
+        if instances:
+            approaches = Cycle(list(instances))
+            approach = instances[next(approaches)]
             await Telegram.send_message(
                 message.from_user.id, approach.message,
                 reply_markup=create_training_keyboard(), parse_mode="HTML"
             )
-            await state.update_data({"trainings": trainings, "approaches": instances})
+            await state.update_data({
+                "trainings": trainings.dump(),
+                "training_id": training_id,
+                "approaches": approaches.dump()
+            })
             await state.set_state(ApproachState.next_approach)
         else:
             await message.reply(
@@ -0,0 +1,108 @@
+import os
+import csv
+import json
+import asyncio
+import threading
+from dataclasses import dataclass, asdict
+
+from geopy.geocoders import Nominatim
+from geopy.exc import GeopyError
+from timezonefinder import TimezoneFinder
+
+from settings import GAZETTEER_PATH, GEOCODE_CONCURRENCY, GEOCODE_TIMEOUT
+
+
+@dataclass
+class Location:
+    address: str
+    latitude: float
+    longitude: float
+    timezone: str
+
+    def __str__(self):
+        return self.address
+
+
+class LocationResolver:
+
+    cache_path = os.path.join(os.path.abspath(""), "cache", "locations.json")
+
+    def __init__(self, gazetteer_path: str = GAZETTEER_PATH, concurrency: int = GEOCODE_CONCURRENCY):
+        self.geocoder = Nominatim(user_agent="geoapiExercises")
+        self.gazetteer = self.load_gazetteer(gazetteer_path) if gazetteer_path else None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.finder_lock = threading.Lock()
+        self.finder = None
+        self.cache_lock = threading.Lock()
+        self.cache_size = 0
+        self.cache = None
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return " ".join(name.casefold().replace("ё", "е").replace(",", " ").split())
+
+    @classmethod
+    def load_gazetteer(cls, path: str) -> dict:
+        with open(path, encoding="utf-8") as file:
+            return {
+                cls.normalize(row["name"]): (row["name"], float(row["latitude"]), float(row["longitude"]))
+                for row in csv.DictReader(file)
+            }
+
+    def get_finder(self) -> TimezoneFinder:
+        with self.finder_lock:
+            if self.finder is None:
+                self.finder = TimezoneFinder()
+            return self.finder
+
+    def read_cache(self) -> dict:
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding="utf-8") as file:
+                return json.load(file)
+        return {}
+
+    def write_cache(self, data: dict):
+        with self.cache_lock:
+            if len(data) < self.cache_size:
+                return
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+            self.cache_size = len(data)
+
+    def geocode(self, key: str, name: str) -> Location | None:
+        if self.gazetteer is not None:
+            if key not in self.gazetteer:
+                return None
+            address, latitude, longitude = self.gazetteer[key]
+        else:
+            try:
+                location = self.geocoder.geocode(name, timeout=GEOCODE_TIMEOUT)
+            except GeopyError:
+                return None
+            if location is None:
+                return None
+            address, latitude, longitude = location.address, location.latitude, location.longitude
+        timezone = self.get_finder().timezone_at(lng=longitude, lat=latitude)
+        if timezone is None:
+            return None
+        return Location(address, latitude, longitude, timezone)
+
+    async def resolve(self, name: str) -> Location | None:
+        loop = asyncio.get_running_loop()
+        if self.cache is None:
+            self.cache = await loop.run_in_executor(None, self.read_cache)
+        key = self.normalize(name)
+        if key in self.cache:
+            return Location(**self.cache[key])
+        async with self.semaphore:
+            location = await loop.run_in_executor(None, self.geocode, key, name)
+        if location is not None:
+            self.cache[key] = asdict(location)
+            await loop.run_in_executor(None, self.write_cache, dict(self.cache))
+        return location
+
+
+location_resolver = LocationResolver()
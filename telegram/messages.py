@@ -61,4 +61,6 @@ info_approaches_message: str = \
 
     🔸 Навигация между упражнениями проводится путем их пролистываниям кнопками ◀️ и ▶️ соответственно.
     🔸 Каждое упражнение имеет свой номер, обозначающий его порядок в тренировке. Для лучшего результата тренировок, советуем выполнять упражнения по порядку.'''
-info_account_message: str = '...'
\ No newline at end of file
+info_account_message: str = '...'
+
+notification_message: str = "Пора тренироваться! Введите /approaches, чтобы просмотреть список упражнений."
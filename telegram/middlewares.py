@@ -2,12 +2,14 @@ from typing import Callable, Dict, Any, Awaitable, Tuple
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
-from api import ApiClient, create_anonymous_user
+from api import ApiClient, api_client, create_anonymous_user
 from models import TelegramUser, Token, Subscriber
 
 
 async def is_authenticated(client, data) -> Subscriber:
-    user: TelegramUser = await client.get_user(*data, cache=True)
+    user: TelegramUser = data[0]
+    if not user.access:
+        user = await client.get_user(*data, cache=True)
 
     if subscriber := user.subscriber:
         return subscriber
@@ -16,19 +18,28 @@ async def is_authenticated(client, data) -> Subscriber:
 async def is_registered(client, data) -> Tuple[TelegramUser, Token]:
     instance: TelegramUser = create_anonymous_user(data)
 
-    token: Token = await client.get_token(instance)
+    token: Token = await client.get_cache(
+        "telegram_id", instance.access_data(), client.handler.get_token
+    )
+    if token is None:
+        user = await client.open_session(instance)
+        if isinstance(user, TelegramUser):
+            return user, Token(access=user.access, refresh=user.refresh)
     if isinstance(token, Token):
         return instance, token
 
 
 class RegisterMiddleware(BaseMiddleware):
+    def __init__(self, client: ApiClient = api_client):
+        self.client = client
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
         event: Message,
         data: Dict[str, Any]
     ) -> Any:
-        client = ApiClient()
+        client = self.client
 
         if args := await is_registered(client, event.from_user):
             data.update({"client": client, "args": args})
@@ -38,13 +49,16 @@ class RegisterMiddleware(BaseMiddleware):
 
 
 class SubscribeMiddleware(BaseMiddleware):
+    def __init__(self, client: ApiClient = api_client):
+        self.client = client
+
     async def __call__(
             self,
             handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
             event: CallbackQuery,
             data: Dict[str, Any]
     ) -> Any:
-        client = ApiClient()
+        client = self.client
         if args := await is_registered(client, event.from_user):
             if subscriber := await is_authenticated(client, args):
                 data.update({"client": client, "subscriber": subscriber})
@@ -341,8 +341,10 @@ class Token:
                 "telegram_id": data.get("telegram_id"),
                 "chat_id": config.get("chat_id")
             }
+            self.expires = data.get("exp", 0)
         except jwt.exceptions.ExpiredSignatureError:
             self.payload = None
+            self.expires = 0
 
     def access_data(self):
         return {"Authorization": "Bearer {access}".format(access=self.access)}
@@ -374,6 +376,7 @@ class TelegramUser:
     last_name: str = ''
     balance: float = 0
     subscriber: Subscriber = None
+    created: bool = False
 
     def access_data(self):
         return {
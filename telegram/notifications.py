@@ -1,22 +1,224 @@
+import time
+import pickle
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
 from pytz import utc
+from sqlalchemy import (
+    create_engine,
+    inspect,
+    text,
+    MetaData,
+    Table,
+    Column,
+    String,
+    Integer
+)
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.executors.pool import ThreadPoolExecutor
-
-from settings import DB_URL
-
-
-scheduler = AsyncIOScheduler(
-    jobstores={
-        'default': SQLAlchemyJobStore(url=DB_URL),
-    },
-    timezone=utc,
-    executors={
-        "cron": ThreadPoolExecutor()
-    },
-    job_defaults={
-        'coalesce': False,
-        'max_instances': 1
-    }
+from api import Telegram
+from messages import notification_message
+from settings import (
+    DB_URL,
+    NOTIFICATION_RATE,
+    NOTIFICATION_RETRIES,
+    NOTIFICATION_WORKERS
 )
+
+MINUTES_PER_DAY = 24 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, -seconds * self.rate)
+        self.updated = now
+
+
+class NotificationEngine:
+
+    metadata = MetaData()
+    table = Table(
+        "notifications", metadata,
+        Column("chat_id", String(32), primary_key=True),
+        Column("weekdays", String(16), nullable=False),
+        Column("minute", Integer, nullable=False)
+    )
+
+    def __init__(self, bot: Bot, db_url: str = DB_URL,
+                 rate: float = NOTIFICATION_RATE, retries: int = NOTIFICATION_RETRIES,
+                 workers: int = NOTIFICATION_WORKERS):
+        self.bot = bot
+        self.db = create_engine(db_url)
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.workers = workers
+        self.buckets = defaultdict(set)
+        self.schedules = {}
+        self.task = None
+        self.ticks = set()
+
+    @staticmethod
+    def to_utc(weekdays, hour: int, minute: int, offset: int) -> tuple[tuple[int, ...], int]:
+        shift = hour * 60 + minute - offset
+        days, utc_minute = divmod(shift, MINUTES_PER_DAY)
+        return tuple(sorted({(day + days) % 7 for day in weekdays})), utc_minute
+
+    def has(self, chat_id) -> bool:
+        return str(chat_id) in self.schedules
+
+    def index(self, chat_id: str, weekdays, minute: int):
+        self.unindex(chat_id)
+        for day in weekdays:
+            self.buckets[(day, minute)].add(chat_id)
+        self.schedules[chat_id] = (tuple(weekdays), minute)
+
+    def unindex(self, chat_id: str):
+        weekdays, minute = self.schedules.pop(chat_id, ((), 0))
+        for day in weekdays:
+            bucket = self.buckets.get((day, minute))
+            if bucket is not None:
+                bucket.discard(chat_id)
+                if not bucket:
+                    del self.buckets[(day, minute)]
+
+    def save(self, chat_id: str, weekdays, minute: int):
+        with self.db.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.chat_id == chat_id))
+            connection.execute(self.table.insert().values(
+                chat_id=chat_id, weekdays=",".join(map(str, weekdays)), minute=minute
+            ))
+
+    def delete(self, chat_id: str):
+        with self.db.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.chat_id == chat_id))
+
+    async def add(self, chat_id, weekdays, hour: int, minute: int, offset: int = 0):
+        chat_id = str(chat_id)
+        weekdays, minute = self.to_utc(weekdays, hour, minute, offset)
+        self.index(chat_id, weekdays, minute)
+        await asyncio.get_running_loop().run_in_executor(None, self.save, chat_id, weekdays, minute)
+
+    async def remove(self, chat_id):
+        chat_id = str(chat_id)
+        self.unindex(chat_id)
+        await asyncio.get_running_loop().run_in_executor(None, self.delete, chat_id)
+
+    def import_jobs(self, connection):
+        if not inspect(connection).has_table("apscheduler_jobs"):
+            return
+        skipped = []
+        for chat_id, state in connection.execute(text("SELECT id, job_state FROM apscheduler_jobs")):
+            try:
+                fields = {field.name: str(field) for field in pickle.loads(state)["trigger"].fields}
+                weekdays = [int(day) for day in fields["day_of_week"].split(",")]
+                hour, minute = int(fields["hour"]), int(fields["minute"])
+            except (
+                pickle.UnpicklingError, ImportError, AttributeError, KeyError, ValueError
+            ) as error:
+                logger.warning("Skipped apscheduler job %s: %r", chat_id, error)
+                skipped.append(chat_id)
+                continue
+            connection.execute(self.table.delete().where(self.table.c.chat_id == chat_id))
+            connection.execute(self.table.insert().values(
+                chat_id=chat_id, weekdays=",".join(map(str, weekdays)), minute=hour * 60 + minute
+            ))
+        if skipped:
+            logger.warning(
+                "Kept apscheduler_jobs, %d jobs were not imported: %s",
+                len(skipped), ", ".join(skipped)
+            )
+            return
+        connection.execute(text("DROP TABLE apscheduler_jobs"))
+
+    def load(self):
+        self.metadata.create_all(self.db)
+        with self.db.begin() as connection:
+            self.import_jobs(connection)
+            for row in connection.execute(self.table.select()):
+                self.index(row.chat_id, [int(day) for day in row.weekdays.split(",")], row.minute)
+
+    async def send(self, chat_id: str) -> bool:
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(chat_id, notification_message)
+                return True
+            except TelegramRetryAfter as error:
+                self.limiter.pause(error.retry_after)
+            except (TelegramNetworkError, TelegramServerError):
+                await asyncio.sleep(2 ** attempt)
+            except TelegramAPIError:
+                return False
+        return False
+
+    async def deliver(self, queue: asyncio.Queue):
+        while not queue.empty():
+            await self.send(queue.get_nowait())
+
+    async def tick(self, moment: datetime):
+        queue = asyncio.Queue()
+        bucket = self.buckets.get((moment.weekday(), moment.hour * 60 + moment.minute), ())
+        for chat_id in sorted(bucket):
+            queue.put_nowait(chat_id)
+        workers = min(self.workers, queue.qsize())
+        await asyncio.gather(*(self.deliver(queue) for _ in range(workers)))
+
+    async def run(self):
+        moment = datetime.now(tz=utc).replace(second=0, microsecond=0)
+        while True:
+            await asyncio.sleep(60 - time.time() % 60)
+            now = datetime.now(tz=utc).replace(second=0, microsecond=0)
+            while moment < now:
+                moment += timedelta(minutes=1)
+                task = asyncio.create_task(self.tick(moment))
+                self.ticks.add(task)
+                task.add_done_callback(self.finish_tick)
+
+    def finish_tick(self, task: asyncio.Task):
+        self.ticks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Notification tick failed", exc_info=task.exception())
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        for task in self.ticks:
+            task.cancel()
+        self.db.dispose()
+
+
+notifier = NotificationEngine(Telegram)
@@ -11,4 +11,24 @@ ADMIN_TELEGRAM_ID = config.get("admin_telegram_id")
 ADMIN_CHAT_ID = config.get("admin_chat_id")
 CACHE_UPDATE_TIME = int(config.get("cache_update_time"))
 
+CONNECTION_LIMIT = int(config.get("connection_limit", 100))
+KEEPALIVE_TIMEOUT = float(config.get("keepalive_timeout", 30))
+DNS_CACHE_TIME = int(config.get("dns_cache_time", 300))
+
+MEMORY_CACHE_SIZE = int(config.get("memory_cache_size", 1024))
+MEMORY_CACHE_TTL = float(config.get("memory_cache_ttl", CACHE_UPDATE_TIME * 2))
+
+TOKEN_REFRESH_MARGIN = int(config.get("token_refresh_margin", 120))
+TOKEN_REFRESH_INTERVAL = int(config.get("token_refresh_interval", 30))
+TOKEN_IDLE_TIMEOUT = int(config.get("token_idle_timeout", 3600))
+
+GEOCODE_CONCURRENCY = int(config.get("geocode_concurrency", 1))
+GEOCODE_TIMEOUT = float(config.get("geocode_timeout", 5))
+GAZETTEER_PATH = config.get("gazetteer_path")
+
+NOTIFICATION_RATE = float(config.get("notification_rate", 25))
+NOTIFICATION_RETRIES = int(config.get("notification_retries", 3))
+NOTIFICATION_WORKERS = int(config.get("notification_workers", 8))
+
+REDIS_URL = config.get("redis_url")
 DB_URL = config.get("db_url")
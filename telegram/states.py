@@ -4,14 +4,13 @@ from typing import List
 import pytz
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from timezonefinder import TimezoneFinder
-from geopy.geocoders import Nominatim
 from aiogram import types
 
 
 from api import (
     Telegram,
     get_programs,
+    get_cached,
     update_subscribe,
     get_trainings,
     get_portions, get_approaches
@@ -34,7 +33,8 @@ from messages import (
     info_my_health_message,
     info_approaches_message
 )
-from notifications import scheduler
+from locations import Location, location_resolver
+from notifications import notifier
 
 
 class ProgramState(StatesGroup):
@@ -79,17 +79,28 @@ class InfoState(StatesGroup):
 
 class Iterable:
 
-    def __init__(self, iterable: List):
-        self.loop = iterable
+    def __init__(self, ids: List, cursor: int = -1):
+        self.ids = list(ids)
+        self.cursor = cursor
+
+    @classmethod
+    def of(cls, instances: List):
+        return cls([instance.id for instance in instances] if isinstance(instances, list) else [])
+
+    @classmethod
+    def load(cls, data: dict | None):
+        return cls(**data) if data else cls([])
+
+    def dump(self) -> dict:
+        return {"ids": self.ids, "cursor": self.cursor}
 
     def __iter__(self):
-        self._count = -1
         return self
 
     def __next__(self, *args, **kwargs):
         try:
-            self._count += 1
-            return self.loop[self._count]
+            self.cursor += 1
+            return self.ids[self.cursor]
         except IndexError:
             raise StopIteration("No content")
 
@@ -98,31 +109,65 @@ class Cycle(Iterable):
 
     def __next__(self, direction: int = 1):
         try:
-            self._count = (self._count + direction) % len(self.loop)
-            return self.loop[self._count]
+            self.cursor = (self.cursor + direction) % len(self.ids)
+            return self.ids[self.cursor]
         except ZeroDivisionError:
             raise ValueError("No content")
 
 
-async def send_approach(call: types.CallbackQuery, state: FSMContext, direction: int = 1):
-    approaches = (await state.get_data()).get("approaches", [])
-    approach = approaches.__next__(direction)
+async def get_next_instance(name: str, state: FSMContext, direction: int = 1):
+    cycle = Cycle.load((await state.get_data()).get(name))
+    instance = await get_cached(name, cycle.__next__(direction))
+    if instance is None:
+        raise ValueError("No content")
+    await state.update_data({name: cycle.dump()})
+    return instance
+
+
+async def load_approaches(user, training_id, cache: bool = True) -> dict:
+    instances = await get_approaches(user, {"training_id": training_id}, cache)
+    return {instance.id: instance for instance in instances} if isinstance(instances, list) else {}
+
+
+async def send_approach(
+        call: types.CallbackQuery, state: FSMContext, direction: int = 1, instances: dict = None
+):
+    data = await state.get_data()
+    approaches = Cycle.load(data.get("approaches"))
+    if instances is None:
+        instances = await load_approaches(call.from_user, data.get("training_id"))
+    try:
+        approach = instances.get(approaches.__next__(direction))
+        if approach is None:
+            instances = await load_approaches(call.from_user, data.get("training_id"), cache=False)
+            approaches = Cycle(list(instances))
+            approach = instances[approaches.__next__(direction)]
+    except ValueError:
+        await state.clear()
+        await call.message.edit_text(
+            "Упражнения недоступны. Нажмите на кнопку <b>Текущая тренировка ⏳</b>, "
+            "чтобы начать заново.",
+            parse_mode="HTML"
+        )
+        return
     await call.message.edit_text(text=approach.message, parse_mode="HTML")
     await call.message.edit_reply_markup(reply_markup=create_training_keyboard())
-    await state.update_data({"approaches": approaches})
+    await state.update_data({"approaches": approaches.dump()})
     await state.set_state(ApproachState.next_approach)
 
 
 async def get_next_approach(call: types.CallbackQuery, callback_data: Move, state: FSMContext):
+    instances = None
     if callback_data.direction == 0:
-        trainings = (await state.get_data()).get("trainings")
+        trainings = Iterable.load((await state.get_data()).get("trainings"))
         try:
-            instances = iter(
-                Cycle(await get_approaches(
-                    call.from_user, {"training_id": next(trainings)}
-                ))
-            )
-            await state.update_data({"trainings": trainings, "approaches": instances})
+            training_id = next(trainings)
+            instances = await load_approaches(call.from_user, training_id)
+            await state.update_data({
+                "trainings": trainings.dump(),
+                "training_id": training_id,
+                "approaches": Cycle(list(instances)).dump()
+            })
         except StopIteration as error:
             await call.message.edit_text(
                 "Программа закончилась. Нажмите на кнопку <b>Текущая тренировка ⏳</b>, "
@@ -130,42 +175,32 @@ async def get_next_approach(call: types.CallbackQuery, callback_data: Move, stat
                 parse_mode="HTML"
             )
             return
-    await send_approach(call, state, callback_data.direction)
-
-
-async def send_notification(chat_id):
-    await Telegram.send_message(
-        chat_id,
-        "Пора тренироваться! Введите /approaches, чтобы просмотреть список упражнений."
-    )
+    await send_approach(call, state, callback_data.direction, instances)
 
 
 async def set_notification(message: types.Message, state: FSMContext):
     data = await state.get_data()
     offset = datetime.now(
         tz=pytz.timezone(data["timezone"])
-    ).utcoffset().total_seconds() // 3600
-
-    scheduler.add_job(
-        send_notification,
-        trigger="cron",
-        kwargs={"chat_id": message.from_user.id},
-        day_of_week=",".join(map(str, data["weekdays"])),
-        hour=(data["hour"] - int(offset)) % 24,
-        minute=data["minute"],
-        id=str(message.from_user.id),
-        replace_existing=True
+    ).utcoffset().total_seconds() // 60
+
+    await notifier.add(
+        message.from_user.id,
+        data["weekdays"],
+        data["hour"],
+        data["minute"],
+        int(offset)
     )
 
 
 async def get_weekdays(call: types.CallbackQuery, callback_data: Schedule, state: FSMContext):
     data = await state.get_data()
-    weekdays, texts = data.get("weekdays", set()), data.get("texts", set())
+    weekdays, texts = data.get("weekdays", []), data.get("texts", [])
 
     if callback_data.filtered:
-        if callback_data.weekday is not None:
-            weekdays.update({callback_data.weekday})
-            texts.update({callback_data.text})
+        if callback_data.weekday is not None and callback_data.weekday not in weekdays:
+            weekdays.append(callback_data.weekday)
+            texts.append(callback_data.text)
         message = "Выберите день недели.\n"
         if texts:
             message += f"Вы уже выбрали: {', '.join(map(lambda t: f'<b>{t}</b>', texts))}"
@@ -177,7 +212,7 @@ async def get_weekdays(call: types.CallbackQuery, callback_data: Schedule, state
         await state.set_state(ScheduleState.weekdays)
     else:
         if not weekdays:
-            await state.update_data({"weekdays": {0, 1, 2, 3, 4}})
+            await state.update_data({"weekdays": [0, 1, 2, 3, 4]})
         await call.message.edit_text(
             "Введите город, в котором живете (необходимо для настройки времени)"
         )
@@ -185,14 +220,9 @@ async def get_weekdays(call: types.CallbackQuery, callback_data: Schedule, state
 
 
 async def get_location(message: types.Message, state: FSMContext):
-    geolocator = Nominatim(user_agent="geoapiExercises")
-    location = geolocator.geocode(message.text)
+    location: Location = await location_resolver.resolve(message.text)
     if location is not None:
-        timezone = TimezoneFinder().timezone_at(
-            lng=location.longitude, lat=location.latitude
-        )
-
-        await state.update_data({"timezone": timezone})
+        await state.update_data({"timezone": location.timezone})
         await message.reply(str(location))
         await Telegram.send_message(
             message.from_user.id,
@@ -316,14 +346,13 @@ async def get_info(call: types.CallbackQuery, callback_data: Info, state: FSMCon
 
 
 async def send_nutritions(call: types.CallbackQuery, state: FSMContext, direction: int = 1):
-    nutritions = (await state.get_data()).get("nutritions", [])
     try:
-        nutrition = nutritions.__next__(direction)
+        nutrition = await get_next_instance("nutritions", state, direction)
         await call.message.edit_text(nutrition.message, parse_mode="HTML")
         await call.message.edit_reply_markup(
             reply_markup=create_content_keyboard(nutrition)
         )
-        await state.update_data({"nutritions": nutritions, "id": nutrition.id})
+        await state.update_data({"id": nutrition.id})
     except ValueError:
         await call.message.edit_text("Контента нет")
         return False
@@ -332,14 +361,12 @@ async def send_nutritions(call: types.CallbackQuery, state: FSMContext, directio
 
 
 async def send_portions(call: types.CallbackQuery, state: FSMContext, direction: int = 1) -> bool:
-    portions = (await state.get_data()).get("portions", [])
     try:
-        portion = portions.__next__(direction)
+        portion = await get_next_instance("portions", state, direction)
         await call.message.edit_text(portion.message, parse_mode="HTML")
         await call.message.edit_reply_markup(
             reply_markup=create_move_keyboard()
         )
-        await state.update_data({"portions": portions})
     except ValueError:
         await call.answer("Контента нет", show_alert=True)
         return False
@@ -353,9 +380,9 @@ async def get_next_nutrition(call: types.CallbackQuery, callback_data: Move, sta
         await state.set_state(NutritionState.next_nutrition)
     else:
         data = await state.get_data()
-        await state.update_data({"portions": iter(Cycle(
+        await state.update_data({"portions": Cycle.of(
             await get_portions({"nutrition_id": data.get("id", 0)})
-        ))})
+        ).dump()})
         if await send_portions(call, state, callback_data.direction):
             await state.set_state(NutritionState.next_portion)
 
@@ -370,14 +397,13 @@ async def get_next_portion(call: types.CallbackQuery, callback_data: Move, state
 
 
 async def send_programs(call: types.CallbackQuery, state: FSMContext, direction: int = 1) -> bool:
-    programs = (await state.get_data()).get("programs", [])
     try:
-        program = programs.__next__(direction)
+        program = await get_next_instance("programs", state, direction)
         await call.message.edit_text(program.message, parse_mode="HTML")
         await call.message.edit_reply_markup(
             reply_markup=create_content_keyboard(program, training_program=program.id)
         )
-        await state.update_data({"programs": programs, "id": program.id})
+        await state.update_data({"id": program.id})
     except ValueError:
         await call.message.edit_text("Контента нет")
         return False
@@ -386,14 +412,12 @@ async def send_programs(call: types.CallbackQuery, state: FSMContext, direction:
 
 
 async def send_trainings(call: types.CallbackQuery, state: FSMContext, direction: int = 1) -> bool:
-    trainings = (await state.get_data()).get("trainings", [])
     try:
-        training = trainings.__next__(direction)
+        training = await get_next_instance("trainings", state, direction)
         await call.message.edit_text(training.message, parse_mode="HTML")
         await call.message.edit_reply_markup(
             reply_markup=create_move_keyboard()
         )
-        await state.update_data({"trainings": trainings})
     except ValueError as error:
         await call.answer("Контента нет", show_alert=True)
         return False
@@ -406,7 +430,7 @@ async def get_program_filter(call: types.CallbackQuery, callback_data: Program,
         await call.message.edit_text("Введите уровень сложности (от 1.00 до 5.00)")
         await state.set_state(ProgramState.difficulty_value)
     else:
-        await state.update_data({"programs": iter(Cycle(await get_programs()))})
+        await state.update_data({"programs": Cycle.of(await get_programs()).dump()})
         await send_programs(call, state)
         await state.set_state(ProgramState.next_program)
 
@@ -459,7 +483,7 @@ async def get_weeks_value(message: types.Message, state: FSMContext):
 async def get_weeks_op(call: types.CallbackQuery, callback_data: Program, state: FSMContext):
     data = await state.get_data()
     data["weeks"] = callback_data.weeks + data.get("weeks")
-    await state.update_data({"programs": iter(Cycle(await get_programs(data)))})
+    await state.update_data({"programs": Cycle.of(await get_programs(data)).dump()})
     await send_programs(call, state)
     await state.set_state(ProgramState.next_program)
 
@@ -470,9 +494,9 @@ async def get_next_program(call: types.CallbackQuery, callback_data: Move, state
         await state.set_state(ProgramState.next_program)
     else:
         data = await state.get_data()
-        await state.update_data({"trainings": iter(Cycle(
+        await state.update_data({"trainings": Cycle.of(
             await get_trainings({"program_id": data.get("id", 0)})
-        ))})
+        ).dump()})
         if await send_trainings(call, state, callback_data.direction):
             await state.set_state(ProgramState.next_training)
 
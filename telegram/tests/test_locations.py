@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from locations import Location, LocationResolver
+
+
+class LocationResolverTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        gazetteer_path = os.path.join(directory.name, "gazetteer.csv")
+        with open(gazetteer_path, "w", encoding="utf-8") as file:
+            file.write("name,latitude,longitude\nОрёл,52.9651,36.0785\nNew York,40.7128,-74.006\n")
+        self.resolver = LocationResolver(gazetteer_path)
+        self.resolver.cache_path = os.path.join(directory.name, "cache", "locations.json")
+
+    def test_normalize(self):
+        self.assertEqual(LocationResolver.normalize("  Орёл,  Россия "), "орел россия")
+        self.assertEqual(LocationResolver.normalize("NEW   york"), "new york")
+
+    async def test_gazetteer(self):
+        with patch.object(self.resolver.geocoder, "geocode") as geocode:
+            location = await self.resolver.resolve("new  YORK")
+            self.assertIsNone(await self.resolver.resolve("Atlantis"))
+            geocode.assert_not_called()
+        self.assertEqual(location, Location("New York", 40.7128, -74.006, "America/New_York"))
+
+    async def test_cache_hit(self):
+        location = await self.resolver.resolve("орел")
+        self.assertEqual(location.timezone, "Europe/Moscow")
+        with open(self.resolver.cache_path, encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"орел": location.__dict__})
+        with patch.object(self.resolver, "geocode") as geocode:
+            self.assertEqual(await self.resolver.resolve("ОРЁЛ"), location)
+            geocode.assert_not_called()
+
+    def test_stale_write(self):
+        self.resolver.write_cache({"a": 1, "b": 2})
+        self.resolver.write_cache({"a": 1})
+        with open(self.resolver.cache_path, encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"a": 1, "b": 2})
+        self.assertEqual(os.listdir(os.path.dirname(self.resolver.cache_path)), ["locations.json"])
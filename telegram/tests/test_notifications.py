@@ -0,0 +1,109 @@
+import asyncio
+import pickle
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from pytz import utc
+from sqlalchemy import text
+
+from notifications import NotificationEngine, RateLimiter
+
+
+class Field:
+    def __init__(self, name: str, value: str):
+        self.name = name
+        self.value = value
+
+    def __str__(self):
+        return self.value
+
+
+class Trigger:
+    def __init__(self, **fields):
+        self.fields = [Field(name, value) for name, value in fields.items()]
+
+
+def job_state(**fields) -> bytes:
+    return pickle.dumps({"trigger": Trigger(**fields)})
+
+
+class ImportJobsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = NotificationEngine(AsyncMock(), "sqlite://")
+        self.addCleanup(self.engine.db.dispose)
+        with self.engine.db.begin() as connection:
+            connection.execute(text("CREATE TABLE apscheduler_jobs (id TEXT, job_state BLOB)"))
+
+    def add_job(self, chat_id: str, state: bytes):
+        with self.engine.db.begin() as connection:
+            connection.execute(
+                text("INSERT INTO apscheduler_jobs VALUES (:id, :state)"),
+                {"id": chat_id, "state": state}
+            )
+
+    def test_all_imported(self):
+        self.add_job("1", job_state(day_of_week="0,2", hour="9", minute="30"))
+        self.engine.load()
+        self.assertEqual(self.engine.schedules, {"1": ((0, 2), 570)})
+        with self.engine.db.connect() as connection:
+            self.assertFalse(self.engine.db.dialect.has_table(connection, "apscheduler_jobs"))
+
+    def test_skipped_job_keeps_table(self):
+        self.add_job("1", job_state(day_of_week="0,2", hour="9", minute="30"))
+        self.add_job("2", job_state(day_of_week="mon-fri", hour="9", minute="30"))
+        self.add_job("3", b"broken")
+        with self.assertLogs("notifications", "WARNING") as logs:
+            self.engine.load()
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(self.engine.schedules, {"1": ((0, 2), 570)})
+        with self.engine.db.connect() as connection:
+            self.assertTrue(self.engine.db.dialect.has_table(connection, "apscheduler_jobs"))
+
+
+class RunTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_ticks_are_kept(self):
+        engine = NotificationEngine(AsyncMock(), "sqlite://")
+        self.addCleanup(engine.db.dispose)
+        started = asyncio.Event()
+        finished = asyncio.Event()
+
+        async def tick(moment: datetime):
+            started.set()
+            await finished.wait()
+
+        now = datetime.now(tz=utc).replace(second=0, microsecond=0)
+        clock = patch("notifications.datetime")
+        sleep = patch("notifications.asyncio.sleep", AsyncMock(side_effect=[None, asyncio.CancelledError]))
+        with patch.object(engine, "tick", tick), clock as datetime_mock, sleep:
+            datetime_mock.now.side_effect = [now, now + timedelta(minutes=1)]
+            with self.assertRaises(asyncio.CancelledError):
+                await engine.run()
+        self.assertEqual(len(engine.ticks), 1)
+        await started.wait()
+        finished.set()
+        await asyncio.gather(*engine.ticks)
+        await asyncio.sleep(0)
+        self.assertEqual(engine.ticks, set())
+
+
+class DeliveryTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_pause(self):
+        limiter = RateLimiter(1000)
+        limiter.pause(0.05)
+        start = time.monotonic()
+        await limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    async def test_tick_order(self):
+        engine = NotificationEngine(AsyncMock(), "sqlite://", rate=1000, workers=3)
+        self.addCleanup(engine.db.dispose)
+        moment = datetime(2024, 1, 1, 9, 30, tzinfo=utc)
+        for chat_id in ("5", "3", "1", "4", "2"):
+            engine.index(chat_id, [moment.weekday()], 570)
+        await engine.tick(moment)
+        self.assertEqual(
+            [call.args[0] for call in engine.bot.send_message.await_args_list],
+            ["1", "2", "3", "4", "5"]
+        )
@@ -0,0 +1,67 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import states
+from api import Telegram
+from states import Cycle, Iterable
+
+
+class IterableTestCase(unittest.TestCase):
+    def test_dump_load(self):
+        iterable = Iterable([3, 1, 2])
+        self.assertEqual(next(iterable), 3)
+        restored = Iterable.load(iterable.dump())
+        self.assertEqual(restored.dump(), {"ids": [3, 1, 2], "cursor": 0})
+        self.assertEqual(list(restored), [1, 2])
+
+    def test_of(self):
+        instances = [SimpleNamespace(id=5), SimpleNamespace(id=7)]
+        self.assertEqual(Iterable.of(instances).dump(), {"ids": [5, 7], "cursor": -1})
+        self.assertEqual(Iterable.of(None).dump(), {"ids": [], "cursor": -1})
+        self.assertEqual(Iterable.load(None).dump(), {"ids": [], "cursor": -1})
+
+
+class CycleTestCase(unittest.TestCase):
+    def test_dump_load(self):
+        cycle = Cycle.of([SimpleNamespace(id=_id) for _id in (1, 2, 3)])
+        self.assertEqual(cycle.__next__(), 1)
+        self.assertEqual(cycle.__next__(-1), 3)
+        restored = Cycle.load(cycle.dump())
+        self.assertEqual(restored.dump(), {"ids": [1, 2, 3], "cursor": 2})
+        self.assertEqual(restored.__next__(0), 3)
+        self.assertEqual(restored.__next__(), 1)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            Cycle.load(Cycle.of([]).dump()).__next__()
+
+
+class SendApproachTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.state = FSMContext(
+            Telegram, MemoryStorage(), StorageKey(bot_id=1, chat_id=1, user_id=1)
+        )
+        await self.state.update_data({"training_id": 1, "approaches": Cycle([1, 2]).dump()})
+        self.call = SimpleNamespace(
+            from_user=SimpleNamespace(id=1),
+            message=SimpleNamespace(edit_text=AsyncMock(), edit_reply_markup=AsyncMock())
+        )
+
+    async def test_deleted_approach(self):
+        approach = SimpleNamespace(id=2, message="second")
+        load = AsyncMock(side_effect=[{2: approach}, {2: approach}])
+        with patch.object(states, "load_approaches", load):
+            await states.send_approach(self.call, self.state)
+        self.call.message.edit_text.assert_awaited_once_with(text="second", parse_mode="HTML")
+        self.assertEqual((await self.state.get_data())["approaches"], {"ids": [2], "cursor": 0})
+
+    async def test_failed_fetch(self):
+        with patch.object(states, "load_approaches", AsyncMock(return_value={})):
+            await states.send_approach(self.call, self.state)
+        self.call.message.edit_reply_markup.assert_not_awaited()
+        self.assertEqual(await self.state.get_data(), {})